@@ -1,55 +1,138 @@
-from fastapi import HTTPException, Depends, Header
+from fastapi import HTTPException, Depends, Header, Query
 from typing import Optional
 import jwt
 import os
 from datetime import datetime, timedelta, timezone
-from models import User, UserRole
+from models import User, UserRole, UserStatus, TokenUser
 from database import users_collection
+from user_cache import user_cache
 
 SECRET_KEY = os.environ.get("JWT_SECRET_KEY", "cemention-secret-key-change-in-production")
 ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 43200  # 30 days
+# Access tokens carry role/status claims, so keep them short-lived; clients renew
+# them with the long-lived refresh token, which re-reads the user from the database.
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.environ.get("ACCESS_TOKEN_EXPIRE_MINUTES", "15"))
+REFRESH_TOKEN_EXPIRE_MINUTES = int(os.environ.get("REFRESH_TOKEN_EXPIRE_MINUTES", "43200"))  # 30 days
+# EventSource cannot send headers, so event streams authenticate with a query token.
+# It is single-purpose and only has to last until the stream is opened.
+STREAM_TOKEN_EXPIRE_MINUTES = 1
 
-def create_access_token(data: dict):
+# Lowest access token version still accepted per user, as far as this worker knows.
+# An admin status change bumps the user's token_version so older access tokens
+# (with the old status claim) are rejected and the client refreshes.
+_token_versions = {}
+
+def create_access_token(data: dict, expires_minutes: int = ACCESS_TOKEN_EXPIRE_MINUTES, token_type: str = "access"):
     to_encode = data.copy()
-    expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    expire = datetime.now(timezone.utc) + timedelta(minutes=expires_minutes)
+    to_encode.update({"exp": expire, "type": token_type})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def verify_token(token: str):
+def create_user_tokens(user: User, token_version: int = 0):
+    """Access token with role/status claims plus a refresh token, for login/register/refresh"""
+    access_token = create_access_token({
+        "user_id": user.id,
+        "role": user.role.value,
+        "status": user.status.value,
+        "ver": token_version
+    })
+    refresh_token = create_access_token(
+        {"user_id": user.id},
+        expires_minutes=REFRESH_TOKEN_EXPIRE_MINUTES,
+        token_type="refresh"
+    )
+    return access_token, refresh_token
+
+def create_stream_token(user: TokenUser):
+    """Short-lived token that only opens event streams (it ends up in URLs and access logs)"""
+    return create_access_token(
+        {"user_id": user.id, "role": user.role.value, "status": user.status.value},
+        expires_minutes=STREAM_TOKEN_EXPIRE_MINUTES,
+        token_type="stream"
+    )
+
+def note_token_version(user_id: str, token_version: int):
+    """Reject tokens older than `token_version` for this user from now on"""
+    if token_version > _token_versions.get(user_id, 0):
+        _token_versions[user_id] = token_version
+
+def verify_token(token: str, token_type: str = "access"):
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token has expired")
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
+    
+    # Tokens issued before typed tokens existed are access tokens
+    if payload.get("type", "access") != token_type:
+        raise HTTPException(status_code=401, detail="Invalid token type")
+    
+    if not payload.get("user_id"):
+        raise HTTPException(status_code=401, detail="Invalid token payload")
+    
+    # Access tokens from before the user's last status change carry stale claims.
+    # Refresh tokens are exempt: refreshing re-reads the user and issues fresh claims.
+    if token_type == "access" and payload.get("ver", 0) < _token_versions.get(payload["user_id"], 0):
+        raise HTTPException(status_code=401, detail="Token has been revoked")
+    
+    return payload
 
-async def get_current_user(authorization: Optional[str] = Header(None)):
+def _bearer_payload(authorization: Optional[str]):
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Authorization header missing or invalid")
     
     token = authorization.replace("Bearer ", "")
-    payload = verify_token(token)
-    user_id = payload.get("user_id")
-    
-    if not user_id:
-        raise HTTPException(status_code=401, detail="Invalid token payload")
+    return verify_token(token)
+
+async def _load_user(user_id: str):
+    user = user_cache.get(user_id)
+    if user:
+        return user
     
     user_doc = await users_collection.find_one({"id": user_id}, {"_id": 0})
     if not user_doc:
         raise HTTPException(status_code=404, detail="User not found")
     
-    return User(**user_doc)
+    user = User(**user_doc)
+    user_cache.set(user_id, user)
+    return user
+
+async def get_current_user(authorization: Optional[str] = Header(None)):
+    """Full user document (cached) - for endpoints that need more than id/role/status"""
+    payload = _bearer_payload(authorization)
+    return await _load_user(payload["user_id"])
+
+async def get_token_user(authorization: Optional[str] = Header(None)):
+    """Identity, role and status straight from the token claims, without a database read"""
+    payload = _bearer_payload(authorization)
+    
+    if "role" not in payload or "status" not in payload:
+        # Legacy token without claims - fall back to the user document
+        user = await _load_user(payload["user_id"])
+        return TokenUser(id=user.id, role=user.role, status=user.status)
+    
+    return TokenUser(id=payload["user_id"], role=payload["role"], status=payload["status"])
+
+async def get_stream_user(token: str = Query(...)):
+    """Identity for EventSource streams, from a ?token= minted by create_stream_token (never an access token)"""
+    payload = verify_token(token, token_type="stream")
+    return TokenUser(id=payload["user_id"], role=payload["role"], status=payload["status"])
 
-async def require_admin(current_user: User = Depends(get_current_user)):
+async def require_admin(current_user: TokenUser = Depends(get_token_user)):
     if current_user.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Admin access required")
     return current_user
 
-async def require_approved(current_user: User = Depends(get_current_user)):
+async def require_approved(current_user: TokenUser = Depends(get_token_user)):
     if current_user.role in [UserRole.DEALER, UserRole.RETAILER]:
-        if current_user.status != "APPROVED":
+        if current_user.status != UserStatus.APPROVED:
+            # The claim may predate an approval made on another worker (whose token version
+            # bump this worker never saw): a stale claim is a 401, so the client refreshes
+            user_doc = await users_collection.find_one({"id": current_user.id}, {"_id": 0, "status": 1, "token_version": 1})
+            if user_doc and user_doc.get("status") != current_user.status.value:
+                note_token_version(current_user.id, user_doc.get("token_version", 0))
+                raise HTTPException(status_code=401, detail="Token has been revoked")
             raise HTTPException(status_code=403, detail="Account pending approval. Contact admin.")
     return current_user
@@ -0,0 +1,99 @@
+"""Micro-benchmark: checkout read phase vs. cart size, before and after batching.
+
+Compares the previous create_order read pattern (cart, then address, then one
+products.find_one per cart item, all sequential) with the current one (cart and
+address concurrently, then a single products $in query).
+
+Runs against MONGO_URL in a throwaway database (BENCH_DB_NAME, default
+cemention_bench) which is dropped afterwards.
+
+Usage:
+    python bench_checkout.py --sizes 1 5 10 25 50 --iterations 200
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+mongo_url = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
+bench_db_name = os.environ.get("BENCH_DB_NAME", "cemention_bench")
+
+USER_ID = "bench-user"
+ADDRESS_ID = "bench-address"
+
+
+async def seed(db, max_size):
+    await db.products.create_index("id", unique=True)
+    await db.carts.create_index("user_id", unique=True)
+    await db.addresses.create_index("id", unique=True)
+    await db.products.insert_many([
+        {"id": f"bench-prod-{i}", "name": f"Bench Cement {i}", "base_price_customer": 305}
+        for i in range(max_size)
+    ])
+    await db.addresses.insert_one({"id": ADDRESS_ID, "user_id": USER_ID, "city": "Pune"})
+
+
+async def set_cart(db, size):
+    items = [{"product_id": f"bench-prod-{i}", "quantity": 100, "price_per_bag": 305} for i in range(size)]
+    await db.carts.update_one({"user_id": USER_ID}, {"$set": {"items": items}}, upsert=True)
+
+
+async def read_sequential(db):
+    cart = await db.carts.find_one({"user_id": USER_ID})
+    await db.addresses.find_one({"id": ADDRESS_ID, "user_id": USER_ID})
+    for item in cart["items"]:
+        await db.products.find_one({"id": item["product_id"]}, {"_id": 0})
+
+
+async def read_batched(db):
+    cart, _ = await asyncio.gather(
+        db.carts.find_one({"user_id": USER_ID}),
+        db.addresses.find_one({"id": ADDRESS_ID, "user_id": USER_ID}),
+    )
+    ids = [item["product_id"] for item in cart["items"]]
+    await db.products.find({"id": {"$in": ids}}, {"_id": 0}).to_list(None)
+
+
+async def measure(fn, db, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        await fn(db)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+async def run(sizes, iterations):
+    client = AsyncIOMotorClient(mongo_url)
+    db = client[bench_db_name]
+    await client.drop_database(bench_db_name)
+    try:
+        await seed(db, max(sizes))
+        print(f"{'items':>5}  {'before p50':>10}  {'before p95':>10}  {'after p50':>9}  {'after p95':>9}  {'speedup':>7}")
+        for size in sizes:
+            await set_cart(db, size)
+            # Warm up connections and the plan cache
+            await read_sequential(db)
+            await read_batched(db)
+            before = await measure(read_sequential, db, iterations)
+            after = await measure(read_batched, db, iterations)
+            print(f"{size:>5}  {before[0]:>8.2f}ms  {before[1]:>8.2f}ms  {after[0]:>7.2f}ms  {after[1]:>7.2f}ms  {before[0] / after[0]:>6.1f}x")
+    finally:
+        await client.drop_database(bench_db_name)
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 5, 10, 25, 50])
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(run(args.sizes, args.iterations))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Micro-benchmark: response serialization cost per 1000 orders, before and after.
+
+"before" is the previous list endpoint path: Order(**doc) for every document,
+then FastAPI's response_model validation + jsonable_encoder + json.dumps.
+"after" is serialization.trusted_list_response (model_construct + cached
+TypeAdapter.dump_json). Needs no database.
+
+Usage:
+    python bench_serialization.py [--orders 1000] [--iterations 50]
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from models import Order
+from serialization import trusted_list_response
+
+
+def make_orders(count):
+    now = datetime.now(timezone.utc)
+    docs = []
+    for i in range(count):
+        items = [
+            {"product_id": f"prod-00{j}", "product_name": f"Cement {j}", "quantity": 100 * (j + 1),
+             "price_per_bag": 300 + j, "total_price": 100 * (j + 1) * (300 + j)}
+            for j in range(3)
+        ]
+        subtotal = sum(item["total_price"] for item in items)
+        docs.append({
+            "id": str(uuid.uuid4()),
+            "user_id": str(uuid.uuid4()),
+            "order_number": f"ORD{i:08d}",
+            "items": items,
+            "subtotal": subtotal,
+            "gst_amount": int(subtotal * 0.18),
+            "surcharge_amount": 0,
+            "total_amount": subtotal + int(subtotal * 0.18),
+            "payment_method": "UPI",
+            "payment_status": "PENDING",
+            "order_status": "PENDING",
+            "delivery_address_id": str(uuid.uuid4()),
+            "created_at": now - timedelta(minutes=i),
+            "updated_at": now - timedelta(minutes=i),
+        })
+    return docs
+
+
+async def before(docs, field):
+    content = await serialize_response(field=field, response_content=[Order(**doc) for doc in docs], is_coroutine=True)
+    return JSONResponse(content).body
+
+
+async def after(docs, field):
+    return trusted_list_response(Order, docs).body
+
+
+async def measure(fn, docs, field, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        await fn(docs, field)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+async def run(count, iterations):
+    docs = make_orders(count)
+    field = create_response_field(name="Response_orders", type_=List[Order])
+
+    # Both paths must produce the same JSON document
+    assert json.loads(await before(docs, field)) == json.loads(await after(docs, field))
+
+    slow = await measure(before, docs, field, iterations)
+    fast = await measure(after, docs, field, iterations)
+    print(f"{count} orders, median of {iterations} runs")
+    print(f"  before (validate + jsonable_encoder): {slow:8.2f} ms  ({slow / count * 1000:.1f} us/order)")
+    print(f"  after  (model_construct + dump_json): {fast:8.2f} ms  ({fast / count * 1000:.1f} us/order)")
+    print(f"  speedup: {slow / fast:.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", type=int, default=1000)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(run(args.orders, args.iterations))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import asyncio
+import hashlib
+import os
+import time
+
+from models import Product, ProductWithPrice, UserRole
+from database import products_collection
+from serialization import list_adapter
+from compression import compress
+
+# In-process product catalog. Admin product mutations invalidate it directly;
+# the TTL bounds how long another worker's edits take to show up here.
+CATALOG_TTL_SECONDS = float(os.environ.get("CATALOG_TTL_SECONDS", "30"))
+
+PRICE_TIERS = (UserRole.DEALER, UserRole.RETAILER, UserRole.CUSTOMER)
+
+
+def price_tier(role: UserRole) -> UserRole:
+    """Price list a role buys from (admins see customer prices)"""
+    return role if role in (UserRole.DEALER, UserRole.RETAILER) else UserRole.CUSTOMER
+
+
+def price_for_role(product: Product, role: UserRole) -> int:
+    tier = price_tier(role)
+    if tier == UserRole.DEALER:
+        return product.base_price_dealer
+    if tier == UserRole.RETAILER:
+        return product.base_price_retailer
+    return product.base_price_customer
+
+
+class ProductCatalog:
+    def __init__(self, ttl: float = CATALOG_TTL_SECONDS):
+        self.ttl = ttl
+        self.version = 0
+        self._products = {}  # product_id -> Product, including inactive products
+        self._payloads = {}  # price tier -> JSON bytes of the view
+        self._etags = {}  # price tier -> ETag of the JSON bytes
+        self._encoded = {}  # (price tier, encoding) -> compressed JSON bytes, filled on first use
+        self._expires_at = 0.0
+        self._generation = 0  # bumped by invalidate(), so a load racing a write is not kept fresh
+        self._loaded_at = None
+        self._lock = asyncio.Lock()
+
+    async def _ensure_fresh(self):
+        if self._expires_at > time.monotonic():
+            return
+        async with self._lock:
+            # Another request may have reloaded while we waited for the lock
+            if self._expires_at > time.monotonic():
+                return
+            await self._load()
+
+    async def _load(self):
+        generation = self._generation
+        docs = await products_collection.find({}, {"_id": 0}).to_list(None)
+        products = {doc["id"]: Product(**doc) for doc in docs}
+        active = [p for p in products.values() if p.is_active]
+
+        payloads = {}
+        for tier in PRICE_TIERS:
+            view = [
+                ProductWithPrice(**p.model_dump(), user_price=price_for_role(p, tier))
+                for p in active
+            ]
+            payloads[tier] = list_adapter(ProductWithPrice).dump_json(view)
+
+        # Content hashes, so every worker holding the same catalog hands out the same ETag
+        etags = {tier: f'"{hashlib.sha1(payload).hexdigest()[:20]}"' for tier, payload in payloads.items()}
+
+        self._products, self._payloads, self._etags = products, payloads, etags
+        self._encoded = {}
+        self.version += 1
+        self._loaded_at = time.time()
+        # Invalidated while we were reading: the snapshot may predate the write, so
+        # serve it for now but leave it expired - the next read loads again
+        if generation == self._generation:
+            self._expires_at = time.monotonic() + self.ttl
+
+    def invalidate(self):
+        """Force a reload on the next read, including over a load already in progress"""
+        self._generation += 1
+        self._expires_at = 0.0
+
+    async def get(self, product_id: str):
+        """Product by id (active or not), or None"""
+        await self._ensure_fresh()
+        product = self._products.get(product_id)
+        if product is None:
+            # May have been created on another worker since our last load
+            doc = await products_collection.find_one({"id": product_id}, {"_id": 0})
+            if doc:
+                product = Product(**doc)
+        return product
+
+    async def get_many(self, product_ids) -> dict:
+        """Products by id for all ids that exist, with a single query for any not loaded"""
+        await self._ensure_fresh()
+        found = {pid: self._products[pid] for pid in product_ids if pid in self._products}
+        missing = [pid for pid in product_ids if pid not in found]
+        if missing:
+            docs = await products_collection.find({"id": {"$in": missing}}, {"_id": 0}).to_list(None)
+            found.update({doc["id"]: Product(**doc) for doc in docs})
+        return found
+
+    async def priced_payload(self, role: UserRole, encoding: str = None):
+        """(body, etag) of the active products priced for `role`, compressed with `encoding` ("br"/"gzip") if given"""
+        await self._ensure_fresh()
+        tier = price_tier(role)
+        # Read both from the same snapshot - a reload swaps the dicts, never mutates them
+        payloads, etags, encoded = self._payloads, self._etags, self._encoded
+        if encoding is None:
+            return payloads[tier], etags[tier]
+        body = encoded.get((tier, encoding))
+        if body is None:
+            body = encoded[(tier, encoding)] = compress(payloads[tier], encoding)
+        return body, etags[tier]
+
+    def stats(self):
+        return {
+            "products": len(self._products),
+            "version": self.version,
+            "loaded_at": self._loaded_at,
+            "ttl_seconds": self.ttl,
+        }
+
+
+catalog = ProductCatalog()
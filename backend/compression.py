@@ -0,0 +1,113 @@
+import gzip
+import os
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+COMPRESSION_MIN_BYTES = int(os.environ.get("COMPRESSION_MIN_BYTES", "1024"))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5  # fast enough to run per response; build-time assets use 11
+
+# Content types worth compressing (images, fonts and archives are already compressed)
+COMPRESSIBLE_TYPES = (
+    "text/", "application/json", "application/javascript", "application/x-ndjson",
+    "application/xml", "image/svg+xml", "application/manifest+json",
+)
+
+
+def accepted_encodings(accept_encoding: str):
+    """Encodings from an Accept-Encoding header that the client did not refuse (q=0)"""
+    accepted = set()
+    for part in (accept_encoding or "").lower().split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name.strip())
+    return accepted
+
+
+def preferred_encoding(accept_encoding: str, available=("br", "gzip")):
+    """Best encoding both sides support ("br" over "gzip"), or None for identity"""
+    accepted = accepted_encodings(accept_encoding)
+    for encoding in available:
+        if encoding == "br" and brotli is None:
+            continue
+        if encoding in accepted or "*" in accepted:
+            return encoding
+    return None
+
+
+def is_compressible(content_type: str):
+    return (content_type or "").startswith(COMPRESSIBLE_TYPES)
+
+
+def compress(body: bytes, encoding: str, quality: int = None):
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY if quality is None else quality)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL if quality is None else quality, mtime=0)
+
+
+class CompressionMiddleware:
+    """Compress complete responses of at least `minimum_size` bytes with br or gzip.
+
+    Responses that already carry a Content-Encoding (precompressed catalog and
+    static files) and streamed responses (exports) pass through untouched.
+    Strong ETags are weakened, as the compressed bytes differ from the entity.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        encoding = preferred_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        start = None
+
+        async def send_wrapper(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body" or start is None:
+                return await send(message)
+
+            start_message, start = start, None
+            headers = MutableHeaders(scope=start_message)
+            body = message.get("body", b"")
+            if (
+                message.get("more_body")
+                or len(body) < self.minimum_size
+                or "content-encoding" in headers
+                or not is_compressible(headers.get("content-type"))
+            ):
+                await send(start_message)
+                return await send(message)
+
+            body = compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            if "accept-encoding" not in headers.get("vary", "").lower():
+                headers.add_vary_header("Accept-Encoding")
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["ETag"] = f"W/{etag}"
+            await send(start_message)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_wrapper)
@@ -1,14 +1,27 @@
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
 import os
+import logging
 from dotenv import load_dotenv
 from pathlib import Path
 
+from metrics import METRICS_ENABLED, mongo_command_metrics
+from profiler import SLOW_QUERY_PROFILER_ENABLED, slow_query_profiler
+
 # Load environment variables
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+logger = logging.getLogger("cemention.database")
+
 mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
-client = AsyncIOMotorClient(mongo_url)
+# Per-collection command timings for the admin metrics endpoint, plus the opt-in slow query log
+event_listeners = [mongo_command_metrics] if METRICS_ENABLED else []
+if SLOW_QUERY_PROFILER_ENABLED:
+    event_listeners.append(slow_query_profiler)
+# tz_aware so stored BSON dates come back as UTC-aware datetimes
+client = AsyncIOMotorClient(mongo_url, tz_aware=True, event_listeners=event_listeners)
 db = client[os.environ.get('DB_NAME', 'cemention_db')]
 
 # Collections
@@ -19,3 +32,75 @@ carts_collection = db.carts
 orders_collection = db.orders
 request_orders_collection = db.request_orders
 otp_collection = db.otps
+stats_collection = db.stats
+idempotency_collection = db.idempotency_keys
+
+# Indexes required by the query shapes used in the routes, keyed by collection name.
+# Names are fixed so that create_indexes() is idempotent across restarts.
+INDEXES = {
+    "users": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("phone", ASCENDING)], name="phone_unique", unique=True),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id"),
+        IndexModel([("role", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="role_created_at_id"),
+        # Status-filtered exports, streamed in (created_at, id) order without an in-memory sort
+        IndexModel([("status", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)], name="status_created_at_id"),
+        IndexModel(
+            [("created_at", ASCENDING), ("id", ASCENDING)],
+            name="pending_created_at_id",
+            partialFilterExpression={"status": "PENDING"},
+        ),
+    ],
+    "products": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("is_active", ASCENDING)], name="is_active"),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id"),
+    ],
+    "addresses": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("user_id", ASCENDING)], name="user_id"),
+    ],
+    "carts": [
+        IndexModel([("user_id", ASCENDING)], name="user_id_unique", unique=True),
+    ],
+    "orders": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel(
+            [("user_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)],
+            name="user_id_created_at_id",
+        ),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id"),
+        IndexModel(
+            [("order_status", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)],
+            name="order_status_created_at_id",
+        ),
+    ],
+    "request_orders": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel(
+            [("user_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)],
+            name="user_id_created_at_id",
+        ),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id"),
+        IndexModel([("status", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)], name="status_created_at_id"),
+    ],
+    "otps": [
+        IndexModel([("phone", ASCENDING)], name="phone_unique", unique=True),
+        # TTL: the server deletes each OTP once expires_at has passed
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "idempotency_keys": [
+        # TTL: stored responses (and claims left by a crashed worker) expire at expires_at
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+}
+
+
+async def ensure_indexes():
+    """Create all declared indexes (no-op for indexes that already exist)"""
+    for name, indexes in INDEXES.items():
+        try:
+            await db[name].create_indexes(indexes)
+        except OperationFailure as e:
+            # e.g. duplicate data blocking a unique index - keep serving, but make it visible
+            logger.error("Index creation failed on %s: %s", name, e)
@@ -0,0 +1,61 @@
+import hashlib
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from database import stats_collection
+
+# Per-collection change counters, bumped after every write that list endpoints can see.
+# List ETags hash the counter with the request URL, so an unchanged collection
+# answers a repeated poll with 304 before running the page query.
+VERSIONS_ID = "versions"
+
+# Let the browser keep user-specific lists but revalidate them on every use
+PRIVATE_CACHE_CONTROL = "private, no-cache"
+
+
+def etag_matches(if_none_match: str, etag: str):
+    """Weak comparison of an If-None-Match header against an entity tag"""
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+
+def variant_etag(etag: str, encoding):
+    """Strong ETag of one content-encoding of an entity"""
+    return etag if encoding is None else f'{etag[:-1]}-{encoding}"'
+
+
+def not_modified(etag: str, cache_control: str = PRIVATE_CACHE_CONTROL, vary: str = "Accept-Encoding, Authorization"):
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control, "Vary": vary})
+
+
+def with_etag(response: Response, etag: str):
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = PRIVATE_CACHE_CONTROL
+    response.headers["Vary"] = "Accept-Encoding, Authorization"
+    return response
+
+
+async def bump_versions(*collection_names: str):
+    """Mark collections as changed - call after the write has been applied"""
+    await stats_collection.update_one(
+        {"_id": VERSIONS_ID},
+        {"$inc": {name: 1 for name in collection_names}},
+        upsert=True
+    )
+
+
+async def list_etag(request: Request, collection_name: str, scope: str = ""):
+    """ETag for a list endpoint reading `collection_name`, and a 304 response if the client has it.
+
+    `scope` separates callers that see different documents for the same URL (e.g. the user id).
+    """
+    doc = await stats_collection.find_one({"_id": VERSIONS_ID}, {"_id": 0, collection_name: 1})
+    version = (doc or {}).get(collection_name, 0)
+    raw = f"{collection_name}:{version}:{scope}:{request.url.path}?{request.url.query}"
+    etag = f'"{hashlib.sha1(raw.encode()).hexdigest()[:20]}"'
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return etag, not_modified(etag)
+    return etag, None
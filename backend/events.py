@@ -0,0 +1,161 @@
+import asyncio
+import json
+import logging
+import os
+from datetime import datetime
+
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger("cemention.events")
+
+# Per-user push of order / request-order status changes over Server-Sent Events.
+# Events are delivered from an in-process pub/sub. With a single worker the routes
+# publish directly; with several workers enable the change stream (needs a replica
+# set, e.g. Atlas) so every worker sees writes made by the others.
+ORDER_EVENTS_CHANGE_STREAM = os.environ.get("ORDER_EVENTS_CHANGE_STREAM", "false").lower() == "true"
+ORDER_EVENTS_QUEUE_SIZE = int(os.environ.get("ORDER_EVENTS_QUEUE_SIZE", "100"))
+ORDER_EVENTS_HEARTBEAT_SECONDS = float(os.environ.get("ORDER_EVENTS_HEARTBEAT_SECONDS", "15"))
+# Streams are closed after this long; the client reconnects with a fresh stream token
+ORDER_EVENTS_MAX_STREAM_SECONDS = float(os.environ.get("ORDER_EVENTS_MAX_STREAM_SECONDS", "600"))
+RECONNECT_MS = 3000
+
+# Fields pushed to the client, per event type (everything else is refetched on demand)
+EVENT_FIELDS = {
+    "order": ("id", "order_number", "order_status", "payment_status", "driver_name", "driver_mobile", "vehicle_number", "invoice_url", "updated_at"),
+    "request_order": ("id", "status", "admin_notes"),
+}
+EVENT_COLLECTIONS = {"orders": "order", "request_orders": "request_order"}
+
+
+def _plain(value):
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+def format_event(event_type: str, data: dict):
+    """One SSE frame"""
+    return f"event: {event_type}\ndata: {json.dumps(data, default=_plain)}\n\n"
+
+
+class Subscription:
+    __slots__ = ("user_id", "queue", "lost")
+
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+        self.queue = asyncio.Queue(maxsize=ORDER_EVENTS_QUEUE_SIZE)
+        self.lost = False  # events were dropped; the stream ends so the client refetches
+
+
+class OrderEvents:
+    """In-process pub/sub of status events keyed by user id, optionally fed by a change stream"""
+
+    def __init__(self):
+        self._subscribers = {}  # user_id -> set of Subscription
+        self._watcher = None
+        self.watching = False
+
+    def subscribe(self, user_id: str):
+        subscription = Subscription(user_id)
+        self._subscribers.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscriptions = self._subscribers.get(subscription.user_id)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscribers[subscription.user_id]
+
+    def _deliver(self, user_id: str, event_type: str, doc: dict):
+        subscriptions = self._subscribers.get(user_id)
+        if not subscriptions:
+            return
+        # Only the fields the writer knows, so clients can merge partial updates
+        frame = format_event(event_type, {field: doc[field] for field in EVENT_FIELDS[event_type] if field in doc})
+        for subscription in subscriptions:
+            try:
+                subscription.queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                subscription.lost = True
+
+    def publish(self, event_type: str, doc: dict):
+        """Push a changed order / request order to its owner (a no-op while the change stream does it)"""
+        if not self.watching:
+            self._deliver(doc["user_id"], event_type, doc)
+
+    def stats(self):
+        return {
+            "change_stream": self.watching,
+            "users": len(self._subscribers),
+            "streams": sum(len(subscriptions) for subscriptions in self._subscribers.values()),
+        }
+
+    async def stream(self, user_id: str):
+        """SSE body for one client: events as they arrive, comment heartbeats in between"""
+        subscription = self.subscribe(user_id)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + ORDER_EVENTS_MAX_STREAM_SECONDS
+        try:
+            yield f"retry: {RECONNECT_MS}\n\n"
+            while not subscription.lost and loop.time() < deadline:
+                try:
+                    yield await asyncio.wait_for(subscription.queue.get(), ORDER_EVENTS_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+        finally:
+            self.unsubscribe(subscription)
+
+    # ---------- change stream ----------
+
+    async def start(self, db):
+        """Start the change stream watcher if enabled; falls back to local publishing when unsupported"""
+        if not ORDER_EVENTS_CHANGE_STREAM:
+            return
+        pipeline = [{"$match": {
+            "ns.coll": {"$in": list(EVENT_COLLECTIONS)},
+            "operationType": {"$in": ["update", "replace"]},
+        }}]
+        try:
+            # Open the cursor here so an unsupported deployment fails now, not in the background task
+            stream = db.watch(pipeline, full_document="updateLookup")
+            change = await stream.try_next()
+        except PyMongoError as e:
+            logger.warning("Order event change stream unavailable, publishing in-process only: %s", e)
+            return
+        self.watching = True
+        if change:
+            self._on_change(change)
+        self._watcher = asyncio.create_task(self._watch(db, pipeline, stream))
+
+    async def stop(self):
+        self.watching = False
+        if self._watcher:
+            self._watcher.cancel()
+            await asyncio.gather(self._watcher, return_exceptions=True)
+            self._watcher = None
+
+    async def _watch(self, db, pipeline, stream):
+        delay = 1
+        while True:
+            try:
+                async with stream:
+                    async for change in stream:
+                        delay = 1
+                        self._on_change(change)
+            except PyMongoError as e:
+                logger.warning("Order event change stream interrupted, resuming in %ds: %s", delay, e)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30)
+            stream = db.watch(pipeline, full_document="updateLookup", resume_after=stream.resume_token)
+
+    def _on_change(self, change):
+        doc = change.get("fullDocument")
+        if not doc or not doc.get("user_id"):
+            return
+        event_type = EVENT_COLLECTIONS[change["ns"]["coll"]]
+        updated = change.get("updateDescription", {}).get("updatedFields")
+        if updated is not None and not set(updated) & set(EVENT_FIELDS[event_type]):
+            return  # none of the fields this event carries changed
+        self._deliver(doc["user_id"], event_type, doc)
+
+
+order_events = OrderEvents()
@@ -0,0 +1,191 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from fastapi import HTTPException
+from fastapi.responses import Response
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from database import idempotency_collection
+
+logger = logging.getLogger("cemention.idempotency")
+
+# Retried POSTs carrying the same Idempotency-Key get the first response replayed
+# instead of running again. Records live in Mongo (TTL-indexed, shared by all
+# workers) with a per-worker front cache; concurrent duplicates in this worker
+# wait on the in-flight call, duplicates on other workers poll its record.
+IDEMPOTENCY_TTL_HOURS = float(os.environ.get("IDEMPOTENCY_TTL_HOURS", "24"))
+IDEMPOTENCY_CACHE_SIZE = int(os.environ.get("IDEMPOTENCY_CACHE_SIZE", "10000"))
+# An in-progress claim outlives a crashed worker by at most this long (plus the TTL monitor delay)
+IDEMPOTENCY_LOCK_SECONDS = 60
+IDEMPOTENCY_WAIT_SECONDS = 10
+IDEMPOTENCY_STORE_WAIT_SECONDS = 5
+MAX_KEY_LENGTH = 255
+
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+
+class IdempotencyStore:
+    def __init__(self, ttl_hours: float = IDEMPOTENCY_TTL_HOURS, cache_size: int = IDEMPOTENCY_CACHE_SIZE):
+        self.ttl_seconds = ttl_hours * 3600
+        self.cache_size = cache_size
+        self._cache = OrderedDict()  # record id -> (expires_at monotonic, fingerprint, stored response)
+        self._inflight = {}  # record id -> Future of (fingerprint, stored response or exception)
+        self._storing = set()  # background writes of completed responses
+
+    async def run(self, key, user_id: str, scope: str, payload: str, execute):
+        """Run `execute()` (returning a Response) once per (user, scope, key).
+
+        `payload` identifies the request body; reusing a key with a different body is a 422.
+        Only successful responses are stored - on an error or cancellation the key is
+        released, so a retry runs again (failed attempts have no side effects to protect).
+        """
+        if key is None:
+            return await execute()
+        if not key or len(key) > MAX_KEY_LENGTH:
+            raise HTTPException(status_code=400, detail=f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters")
+
+        record_id = f"{user_id}:{scope}:{key}"
+        fingerprint = hashlib.sha256(payload.encode()).hexdigest()
+
+        cached = self._cached(record_id)
+        if cached:
+            return _replay(*cached, fingerprint)
+
+        inflight = self._inflight.get(record_id)
+        if inflight is not None:
+            stored_fingerprint, outcome = await asyncio.shield(inflight)
+            _check_fingerprint(stored_fingerprint, fingerprint)
+            if isinstance(outcome, asyncio.CancelledError):
+                raise HTTPException(status_code=409, detail="The first request with this Idempotency-Key was interrupted, please retry")
+            if isinstance(outcome, BaseException):
+                raise outcome
+            return _replay(stored_fingerprint, outcome, fingerprint)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[record_id] = future
+        claimed = False
+        try:
+            stored = await self._claim(record_id, fingerprint)
+            if stored:
+                self._remember(record_id, fingerprint, stored)
+                future.set_result((fingerprint, stored))
+                return _replay(fingerprint, stored, fingerprint)
+            claimed = True
+            response = await execute()
+        except BaseException as e:
+            # Nothing was committed (or the client went away mid-call): free the key for a retry.
+            # Waiters are resolved on every path, cancellation included, so none of them hangs.
+            if not future.done():
+                future.set_result((fingerprint, e))
+            if claimed:
+                await self._release(record_id)
+            raise
+        finally:
+            del self._inflight[record_id]
+
+        # execute() has committed from here on - the key must never become retryable again
+        stored = {"status_code": response.status_code, "body": response.body, "media_type": response.media_type}
+        self._remember(record_id, fingerprint, stored)
+        future.set_result((fingerprint, stored))
+        store = asyncio.ensure_future(self._store(record_id, fingerprint, stored))
+        self._storing.add(store)
+        store.add_done_callback(self._storing.discard)
+        try:
+            # Usually immediate; during a Mongo outage the write keeps retrying in the background
+            await asyncio.wait_for(asyncio.shield(store), IDEMPOTENCY_STORE_WAIT_SECONDS)
+        except asyncio.TimeoutError:
+            logger.error("Idempotency record %s not stored yet, still retrying", record_id)
+        return response
+
+    async def _release(self, record_id: str):
+        try:
+            await asyncio.shield(idempotency_collection.delete_one({"_id": record_id, "status": "in_progress"}))
+        except (PyMongoError, asyncio.CancelledError) as e:
+            # The claim expires after IDEMPOTENCY_LOCK_SECONDS instead
+            logger.warning("Could not release idempotency claim %s: %r", record_id, e)
+
+    async def _store(self, record_id: str, fingerprint: str, stored: dict):
+        """Record a completed response, retrying until it lands (upsert: the claim may have expired)"""
+        delay = 0.1
+        while True:
+            try:
+                await idempotency_collection.update_one(
+                    {"_id": record_id},
+                    {"$set": {
+                        "status": "done",
+                        "fingerprint": fingerprint,
+                        "response": stored,
+                        "expires_at": datetime.now(timezone.utc) + timedelta(seconds=self.ttl_seconds)
+                    }},
+                    upsert=True
+                )
+                return
+            except PyMongoError as e:
+                logger.warning("Storing idempotency record %s failed, retrying in %.1fs: %s", record_id, delay, e)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 5)
+
+    async def _claim(self, record_id: str, fingerprint: str):
+        """Take the key for this call (None), or the stored response of an earlier one"""
+        deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+        while True:
+            try:
+                await idempotency_collection.insert_one({
+                    "_id": record_id,
+                    "status": "in_progress",
+                    "fingerprint": fingerprint,
+                    "expires_at": datetime.now(timezone.utc) + timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS)
+                })
+                return None
+            except DuplicateKeyError:
+                pass
+
+            doc = await idempotency_collection.find_one({"_id": record_id})
+            if doc is None:
+                continue  # released or expired in between - claim again
+            _check_fingerprint(doc["fingerprint"], fingerprint)
+            if doc["status"] == "done":
+                return doc["response"]
+            if time.monotonic() > deadline:
+                raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still being processed")
+            await asyncio.sleep(0.1)
+
+    def _cached(self, record_id: str):
+        entry = self._cache.get(record_id)
+        if entry is None:
+            return None
+        expires_at, fingerprint, stored = entry
+        if time.monotonic() > expires_at:
+            del self._cache[record_id]
+            return None
+        self._cache.move_to_end(record_id)
+        return fingerprint, stored
+
+    def _remember(self, record_id: str, fingerprint: str, stored: dict):
+        self._cache[record_id] = (time.monotonic() + self.ttl_seconds, fingerprint, stored)
+        self._cache.move_to_end(record_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+
+def _check_fingerprint(stored: str, fingerprint: str):
+    if stored != fingerprint:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+
+
+def _replay(stored_fingerprint: str, stored: dict, fingerprint: str):
+    _check_fingerprint(stored_fingerprint, fingerprint)
+    return Response(
+        content=stored["body"],
+        status_code=stored["status_code"],
+        media_type=stored["media_type"],
+        headers={REPLAYED_HEADER: "true"}
+    )
+
+
+idempotency = IdempotencyStore()
@@ -0,0 +1,96 @@
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+# ULID-style ids: 48-bit millisecond timestamp + 80 random bits, as 26 Crockford
+# base32 characters. They sort by creation time, so inserts append to the right
+# edge of the id index and a time window is an id range. Ids minted within the
+# same millisecond increment the random part, so one process never goes backwards.
+#
+# Documents created before these ids keep their uuid4 ids. Lookups are by
+# equality and work for both. Legacy ids can sort inside an id range, so
+# id_range() also matches the id format and range scans skip legacy documents
+# (use created_at for those).
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+TIME_CHARS = 10
+RANDOM_CHARS = 16
+ID_LENGTH = TIME_CHARS + RANDOM_CHARS
+RANDOM_BITS = 80
+
+_DECODE = {char: value for value, char in enumerate(ALPHABET)}
+# Anchored, so the server checks it against the index keys the range bounds select
+SORTABLE_ID_PATTERN = f"^[{ALPHABET}]{{{ID_LENGTH}}}$"
+
+
+def _encode(value: int, length: int):
+    chars = []
+    for _ in range(length):
+        value, digit = divmod(value, 32)
+        chars.append(ALPHABET[digit])
+    return "".join(reversed(chars))
+
+
+def _to_ms(moment: datetime):
+    return int(moment.timestamp() * 1000)
+
+
+class IdGenerator:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._last_random = 0
+
+    def new(self):
+        with self._lock:
+            ms = time.time_ns() // 1_000_000
+            if ms <= self._last_ms:
+                # Same millisecond (or the clock stepped back): continue from the last id
+                ms = self._last_ms
+                self._last_random += 1
+                if self._last_random >> RANDOM_BITS:
+                    ms += 1
+                    self._last_random = int.from_bytes(os.urandom(RANDOM_BITS // 8), "big") >> 1
+            else:
+                self._last_random = int.from_bytes(os.urandom(RANDOM_BITS // 8), "big")
+            self._last_ms = ms
+            return _encode(ms, TIME_CHARS) + _encode(self._last_random, RANDOM_CHARS)
+
+
+_generator = IdGenerator()
+
+
+def new_id() -> str:
+    """A new time-sortable id"""
+    return _generator.new()
+
+
+def is_sortable_id(value: str) -> bool:
+    """True for ids from new_id(), False for legacy uuid4 ids"""
+    return len(value) == ID_LENGTH and all(char in _DECODE for char in value)
+
+
+def id_timestamp(value: str):
+    """Creation time encoded in an id (None for legacy ids)"""
+    if not is_sortable_id(value):
+        return None
+    ms = 0
+    for char in value[:TIME_CHARS]:
+        ms = ms * 32 + _DECODE[char]
+    return datetime.fromtimestamp(ms / 1000, timezone.utc)
+
+
+def id_floor(moment: datetime) -> str:
+    """Smallest id that can be minted at `moment` - a range bound for id scans"""
+    return _encode(_to_ms(moment), TIME_CHARS) + ALPHABET[0] * RANDOM_CHARS
+
+
+def id_range(start: datetime, end: datetime) -> dict:
+    """Query on `id` for documents created in [start, end), e.g. {"id": id_range(a, b)}"""
+    return {"$gte": id_floor(start), "$lt": id_floor(end), "$regex": SORTABLE_ID_PATTERN}
+
+
+def order_number(order_id: str) -> str:
+    """ORD + the id's creation time (UTC, to the second) + its last 6 characters"""
+    created = id_timestamp(order_id) or datetime.now(timezone.utc)
+    return f"ORD{created.strftime('%Y%m%d%H%M%S')}{order_id.replace('-', '')[-6:].upper()}"
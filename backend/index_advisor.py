@@ -0,0 +1,91 @@
+"""Index advisor: explain() every route query shape and report collection scans.
+
+Usage:
+    python index_advisor.py            # report only
+    python index_advisor.py --create   # create declared indexes first
+
+Exits with status 1 if any query shape still resolves to a COLLSCAN.
+"""
+import argparse
+import asyncio
+import sys
+
+from database import client, db, ensure_indexes
+from profiler import find_stages
+
+KEYSET_DESC = [("created_at", -1), ("id", -1)]
+KEYSET_ASC = [("created_at", 1), ("id", 1)]
+
+# (route, collection, filter, sort) - placeholder values only need the right type.
+# The catalog's full product load is intentionally a scan and is not listed.
+QUERY_SHAPES = [
+    ("POST /api/auth/register", "users", {"phone": "+910000000000"}, None),
+    ("POST /api/auth/login", "users", {"phone": "+910000000000"}, None),
+    ("auth.get_current_user", "users", {"id": "user-id"}, None),
+    ("GET /api/admin/users/pending", "users", {"status": "PENDING"}, KEYSET_ASC),
+    ("GET /api/admin/users", "users", {}, KEYSET_DESC),
+    ("GET /api/admin/users?role=", "users", {"role": "DEALER"}, KEYSET_DESC),
+    ("GET /api/admin/products", "products", {}, KEYSET_DESC),
+    ("POST /api/cart/add", "products", {"id": "product-id"}, None),
+    ("POST /api/cart/add", "carts", {"user_id": "user-id"}, None),
+    ("POST /api/orders/create", "addresses", {"id": "address-id", "user_id": "user-id"}, None),
+    ("GET /api/orders/my-orders", "orders", {"user_id": "user-id"}, KEYSET_DESC),
+    ("GET /api/orders/{order_id}", "orders", {"id": "order-id", "user_id": "user-id"}, None),
+    ("GET /api/orders/request-orders", "request_orders", {"user_id": "user-id"}, KEYSET_DESC),
+    ("GET /api/admin/orders", "orders", {}, KEYSET_DESC),
+    ("PATCH /api/admin/orders/{order_id}", "orders", {"id": "order-id"}, None),
+    ("GET /api/admin/request-orders", "request_orders", {}, KEYSET_DESC),
+    ("GET /api/admin/export/orders", "orders", {}, KEYSET_ASC),
+    ("GET /api/admin/export/orders?status=", "orders", {"order_status": "DELIVERED"}, KEYSET_ASC),
+    ("GET /api/admin/export/users?status=", "users", {"status": "APPROVED"}, KEYSET_ASC),
+    ("GET /api/admin/export/request-orders?status=", "request_orders", {"status": "PENDING"}, KEYSET_ASC),
+    ("POST /api/auth/verify-otp", "otps", {"phone": "+910000000000"}, None),
+]
+
+
+async def explain_shape(collection, query, sort):
+    cursor = db[collection].find(query)
+    if sort:
+        cursor = cursor.sort(sort)
+    explain = await cursor.explain()
+    return explain.get("queryPlanner", {}).get("winningPlan", {})
+
+
+async def run(create: bool):
+    if create:
+        await ensure_indexes()
+
+    scans = 0
+    for route, collection, query, sort in QUERY_SHAPES:
+        plan = await explain_shape(collection, query, sort)
+        collscan = any(find_stages(plan, "COLLSCAN"))
+        in_memory_sort = any(find_stages(plan, "SORT"))
+        indexes = sorted({s.get("indexName") for s in find_stages(plan, "IXSCAN")} - {None})
+
+        if collscan:
+            scans += 1
+            status = "COLLSCAN"
+        elif in_memory_sort:
+            status = "SORT   "
+        else:
+            status = "OK     "
+
+        shape = f"{collection}.find({query})" + (f".sort({sort})" if sort else "")
+        print(f"[{status}] {route:40} {shape}  {', '.join(indexes)}")
+
+    print(f"\n{len(QUERY_SHAPES)} query shapes checked, {scans} collection scan(s)")
+    return scans
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report route query shapes that scan whole collections")
+    parser.add_argument("--create", action="store_true", help="create declared indexes before explaining")
+    args = parser.parse_args()
+
+    scans = asyncio.run(run(args.create))
+    client.close()
+    sys.exit(1 if scans else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import asyncio
+from collections import defaultdict
+
+from database import products_collection
+
+
+class InsufficientStock(Exception):
+    def __init__(self, product_ids):
+        self.product_ids = product_ids
+        super().__init__(f"Insufficient stock for: {', '.join(product_ids)}")
+
+
+def _merge(lines):
+    """Sum quantities per product so each product is touched once"""
+    totals = defaultdict(int)
+    for product_id, quantity in lines:
+        totals[product_id] += quantity
+    return totals
+
+
+async def _release(totals):
+    await asyncio.gather(*(
+        products_collection.update_one({"id": product_id}, {"$inc": {"stock_available": quantity}})
+        for product_id, quantity in totals.items()
+    ))
+
+
+async def reserve_stock(lines):
+    """Atomically take stock for every (product_id, quantity) line, or for none of them.
+
+    Each product is decremented with a conditional update that only matches while
+    enough stock is left, so concurrent checkouts can never oversell. If any line
+    cannot be satisfied, the lines already taken are put back and
+    InsufficientStock is raised.
+    """
+    totals = _merge(lines)
+    product_ids = list(totals)
+    results = await asyncio.gather(*(
+        products_collection.find_one_and_update(
+            {"id": product_id, "stock_available": {"$gte": totals[product_id]}},
+            {"$inc": {"stock_available": -totals[product_id]}},
+            projection={"_id": 1}
+        )
+        for product_id in product_ids
+    ))
+
+    failed = [pid for pid, doc in zip(product_ids, results) if doc is None]
+    if failed:
+        await _release({pid: totals[pid] for pid, doc in zip(product_ids, results) if doc is not None})
+        raise InsufficientStock(failed)
+
+
+async def release_stock(lines):
+    """Return stock taken by reserve_stock (e.g. order creation failed or was cancelled)"""
+    await _release(_merge(lines))
@@ -0,0 +1,273 @@
+"""Load test: concurrent mixed workloads with per-route latency percentiles.
+
+Seeds approved dealers, products and addresses into a throwaway database
+(LOADTEST_DB_NAME, default cemention_loadtest), then runs virtual users that
+log in over OTP and loop over weighted scenarios - catalog browse, cart add,
+checkout, order history and admin lists/reports - for a fixed duration.
+Reports count, error rate, throughput and p50/p95/p99 latency per route.
+
+By default the app runs in-process over httpx's ASGI transport. With
+--base-url the requests go to a running server instead; start it against the
+same database with OTP demo mode on, e.g.
+
+    DB_NAME=cemention_loadtest OTP_DEMO_MODE=true SMS_PROVIDER=stub uvicorn production_ready:app --port 8001
+
+--save-baseline writes the results as JSON; --baseline compares against such
+a file and exits 1 if any route's p95 or the overall throughput regressed by
+more than --tolerance.
+
+Usage:
+    python loadtest.py [--users 50] [--duration 30] [--base-url URL] [--baseline FILE] [--save-baseline FILE]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+# Point the shared client at a scratch database before anything imports it
+os.environ["DB_NAME"] = os.environ.get("LOADTEST_DB_NAME", "cemention_loadtest")
+os.environ.setdefault("OTP_DEMO_MODE", "true")
+os.environ.setdefault("SMS_PROVIDER", "stub")
+
+import httpx  # noqa: E402
+
+from database import client, db, users_collection, products_collection, addresses_collection  # noqa: E402
+
+# Scenario name -> relative weight
+DEFAULT_MIX = {
+    "browse": 50,
+    "cart_add": 20,
+    "checkout": 10,
+    "my_orders": 10,
+    "admin": 10,
+}
+
+
+def admin_phone(index):
+    # One admin per virtual user: concurrent send-otp calls for one phone replace each other's code
+    return f"+91{6000000000 + index}"
+
+
+def dealer_phone(index):
+    return f"+91{7000000000 + index}"
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of sorted samples"""
+    if not samples:
+        return 0.0
+    rank = max(1, -(-len(samples) * pct // 100))
+    return samples[int(rank) - 1]
+
+
+class Recorder:
+    """Latency samples and error counts per route label"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def call(self, http, label, method, url, expected=(200,), **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await http.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            response = None
+        self.samples[label].append((time.perf_counter() - start) * 1000)
+        if response is None or response.status_code not in expected:
+            self.errors[label] += 1
+            return None
+        return response
+
+    def report(self, elapsed):
+        routes = {}
+        for label in sorted(self.samples):
+            samples = sorted(self.samples[label])
+            routes[label] = {
+                "count": len(samples),
+                "errors": self.errors[label],
+                "error_rate": round(self.errors[label] / len(samples), 4),
+                "rps": round(len(samples) / elapsed, 1),
+                "p50_ms": round(percentile(samples, 50), 2),
+                "p95_ms": round(percentile(samples, 95), 2),
+                "p99_ms": round(percentile(samples, 99), 2),
+            }
+        total = sum(r["count"] for r in routes.values())
+        errors = sum(r["errors"] for r in routes.values())
+        return {
+            "elapsed_s": round(elapsed, 2),
+            "requests": total,
+            "errors": errors,
+            "rps": round(total / elapsed, 1),
+            "routes": routes,
+        }
+
+
+async def seed(users, products):
+    now = datetime.now(timezone.utc)
+    await users_collection.insert_many(
+        [{"id": f"lt-admin-{i}", "phone": admin_phone(i), "role": "ADMIN", "status": "APPROVED",
+          "is_active": True, "created_at": now, "updated_at": now}
+         for i in range(users)] +
+        [{"id": f"lt-user-{i}", "phone": dealer_phone(i), "role": "DEALER", "status": "APPROVED",
+          "business_name": f"Load Dealer {i}", "is_active": True, "created_at": now, "updated_at": now}
+         for i in range(users)]
+    )
+    await addresses_collection.insert_many([
+        {"id": f"lt-address-{i}", "user_id": f"lt-user-{i}", "address_line1": "1 Load St",
+         "city": "Pune", "state": "MH", "pincode": "411001", "is_default": True, "created_at": now}
+        for i in range(users)
+    ])
+    await products_collection.insert_many([
+        {"id": f"lt-prod-{i}", "name": f"Load Cement {i}", "brand": "LoadCo", "base_price_dealer": 300,
+         "base_price_retailer": 303, "base_price_customer": 305, "min_quantity": 100,
+         "stock_available": 10 ** 9, "is_active": True, "created_at": now, "updated_at": now}
+        for i in range(products)
+    ])
+
+
+async def login(http, recorder, phone):
+    """OTP round trip plus login; returns auth headers or None"""
+    sent = await recorder.call(http, "POST /api/auth/send-otp", "POST", "/api/auth/send-otp", json={"phone": phone})
+    if not sent or not sent.json().get("otp"):
+        return None
+    verified = await recorder.call(http, "POST /api/auth/verify-otp", "POST", "/api/auth/verify-otp",
+                                   json={"phone": phone, "otp": sent.json()["otp"]})
+    if verified and not verified.json().get("success"):
+        # Rejected codes come back as 200 {"success": false}
+        recorder.errors["POST /api/auth/verify-otp"] += 1
+    response = await recorder.call(http, "POST /api/auth/login", "POST", "/api/auth/login", json={"phone": phone})
+    if not response or not response.json().get("token"):
+        return None
+    return {"Authorization": f"Bearer {response.json()['token']}"}
+
+
+async def virtual_user(http, recorder, index, products, mix, deadline, seed_value):
+    rng = random.Random(seed_value + index)
+    user_headers = await login(http, recorder, dealer_phone(index))
+    admin_headers = await login(http, recorder, admin_phone(index))
+    if not user_headers or not admin_headers:
+        return
+
+    scenarios, weights = zip(*mix.items())
+    address_id = f"lt-address-{index}"
+
+    async def cart_add():
+        await recorder.call(http, "POST /api/cart/add", "POST", "/api/cart/add", headers=user_headers, json={
+            "product_id": f"lt-prod-{rng.randrange(products)}", "quantity": rng.choice([100, 200, 500])
+        })
+
+    while time.perf_counter() < deadline:
+        scenario = rng.choices(scenarios, weights)[0]
+        if scenario == "browse":
+            await recorder.call(http, "GET /api/products", "GET", "/api/products", headers=user_headers)
+        elif scenario == "cart_add":
+            await cart_add()
+        elif scenario == "checkout":
+            await cart_add()
+            await recorder.call(http, "POST /api/orders/create", "POST", "/api/orders/create", headers=user_headers,
+                                json={"delivery_address_id": address_id, "payment_method": "COD"})
+        elif scenario == "my_orders":
+            await recorder.call(http, "GET /api/orders/my-orders", "GET", "/api/orders/my-orders",
+                                headers=user_headers, params={"limit": 20})
+        elif scenario == "admin":
+            route = rng.choice(["/api/admin/orders", "/api/admin/users", "/api/admin/reports/summary"])
+            params = {"limit": 50} if not route.endswith("summary") else None
+            await recorder.call(http, f"GET {route}", "GET", route, headers=admin_headers, params=params)
+
+
+def compare(report, baseline, tolerance):
+    """Regressions of this run against a saved baseline report"""
+    regressions = []
+    if report["rps"] < baseline["rps"] * (1 - tolerance):
+        regressions.append(f"throughput {report['rps']}/s < baseline {baseline['rps']}/s")
+    for label, route in report["routes"].items():
+        base = baseline["routes"].get(label)
+        if not base:
+            continue
+        if route["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{label} p95 {route['p95_ms']}ms > baseline {base['p95_ms']}ms")
+        if route["error_rate"] > base["error_rate"] + 0.01:
+            regressions.append(f"{label} error rate {route['error_rate']:.2%} > baseline {base['error_rate']:.2%}")
+    return regressions
+
+
+def print_report(report):
+    print(f"{report['requests']} requests in {report['elapsed_s']}s "
+          f"({report['rps']}/s), {report['errors']} errors")
+    print(f"{'route':<36} {'count':>7} {'err%':>6} {'rps':>7} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for label, r in report["routes"].items():
+        print(f"{label:<36} {r['count']:>7} {r['error_rate'] * 100:>5.1f}% {r['rps']:>7} "
+              f"{r['p50_ms']:>6.1f}ms {r['p95_ms']:>6.1f}ms {r['p99_ms']:>6.1f}ms")
+
+
+async def run(args):
+    await client.drop_database(db.name)
+    await seed(args.users, args.products)
+
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.users * 2)
+
+    async def drive(http):
+        deadline = time.perf_counter() + args.duration
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            virtual_user(http, recorder, i, args.products, DEFAULT_MIX, deadline, args.seed)
+            for i in range(args.users)
+        ))
+        return time.perf_counter() - started
+
+    try:
+        if args.base_url:
+            async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=30) as http:
+                elapsed = await drive(http)
+        else:
+            from production_ready import app
+            # ASGITransport does not send lifespan events - run startup/shutdown ourselves
+            async with app.router.lifespan_context(app):
+                transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+                async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=30) as http:
+                    elapsed = await drive(http)
+    finally:
+        await client.drop_database(db.name)
+
+    return recorder.report(elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=50, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to run")
+    parser.add_argument("--products", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--base-url", help="run against a live server instead of in-process")
+    parser.add_argument("--baseline", help="compare against this baseline JSON")
+    parser.add_argument("--save-baseline", help="write this run's results as a baseline JSON")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    client.close()
+    print_report(report)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline written to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print("REGRESSED: " + "; ".join(regressions))
+            sys.exit(1)
+        print("OK: within tolerance of baseline")
+
+
+if __name__ == "__main__":
+    main()
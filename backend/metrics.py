@@ -0,0 +1,197 @@
+import os
+import time
+from bisect import bisect_left
+from collections import defaultdict, deque
+
+from pymongo import monitoring
+
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "true").lower() == "true"
+
+# Histogram bucket upper bounds in milliseconds (the last bucket is +Inf)
+BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram; observe() is a bisect and two additions"""
+
+    __slots__ = ("counts", "count", "sum")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, ms: float):
+        self.counts[bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.sum += ms
+
+    def quantile(self, q: float):
+        """Upper bound of the bucket holding the q-quantile (None past the last bound)"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS_MS, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return None
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_ms": round(self.sum / self.count, 2) if self.count else 0.0,
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+            "p99_ms": self.quantile(0.99),
+        }
+
+
+class Metrics:
+    """Per-route HTTP and per-collection Mongo command metrics for this worker.
+
+    All histogram updates happen on the event loop thread, so no locks are needed.
+    Mongo command events arrive on Motor's executor threads; they are appended to a
+    deque (atomic in CPython) and folded into the histograms on the loop.
+    """
+
+    def __init__(self, max_pending_events: int = 100000):
+        self.started = time.time()
+        self.http = defaultdict(Histogram)  # (method, route) -> Histogram
+        self.http_status = defaultdict(int)  # (method, route, status) -> count
+        self.mongo = defaultdict(Histogram)  # (collection, command) -> Histogram
+        self.mongo_failures = defaultdict(int)  # (collection, command) -> count
+        self._mongo_events = deque(maxlen=max_pending_events)
+
+    def observe_request(self, method: str, route: str, status: int, ms: float):
+        self.http[(method, route)].observe(ms)
+        self.http_status[(method, route, status)] += 1
+
+    def record_command(self, collection: str, command: str, ms: float, failed: bool):
+        """Thread-safe: called from pymongo's monitoring callbacks"""
+        self._mongo_events.append((collection, command, ms, failed))
+
+    def fold_commands(self):
+        events = self._mongo_events
+        while events:
+            collection, command, ms, failed = events.popleft()
+            self.mongo[(collection, command)].observe(ms)
+            if failed:
+                self.mongo_failures[(collection, command)] += 1
+
+    def snapshot(self):
+        self.fold_commands()
+        routes = {}
+        for (method, route), histogram in sorted(self.http.items()):
+            statuses = {
+                str(status): count
+                for (m, r, status), count in self.http_status.items() if m == method and r == route
+            }
+            routes[f"{method} {route}"] = {**histogram.summary(), "status": statuses}
+        commands = {
+            f"{collection}.{command}": {**histogram.summary(), "failures": self.mongo_failures[(collection, command)]}
+            for (collection, command), histogram in sorted(self.mongo.items())
+        }
+        return {"uptime_seconds": round(time.time() - self.started), "http": routes, "mongo": commands}
+
+    def prometheus(self):
+        """Metrics in the Prometheus text exposition format (durations in seconds)"""
+        self.fold_commands()
+        lines = []
+
+        def histogram_lines(name, labels, histogram):
+            cumulative = 0
+            for bound, count in zip(BUCKETS_MS + (float("inf"),), histogram.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound / 1000)
+                lines.append(f'{name}_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f"{name}_sum{{{labels}}} {histogram.sum / 1000}")
+            lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+
+        lines.append("# HELP cemention_http_request_duration_seconds HTTP request latency by route")
+        lines.append("# TYPE cemention_http_request_duration_seconds histogram")
+        for (method, route), histogram in sorted(self.http.items()):
+            histogram_lines("cemention_http_request_duration_seconds", f'method="{method}",route="{_escape(route)}"', histogram)
+
+        lines.append("# HELP cemention_http_responses_total HTTP responses by route and status")
+        lines.append("# TYPE cemention_http_responses_total counter")
+        for (method, route, status), count in sorted(self.http_status.items()):
+            lines.append(f'cemention_http_responses_total{{method="{method}",route="{_escape(route)}",status="{status}"}} {count}')
+
+        lines.append("# HELP cemention_mongo_command_duration_seconds MongoDB command latency by collection")
+        lines.append("# TYPE cemention_mongo_command_duration_seconds histogram")
+        for (collection, command), histogram in sorted(self.mongo.items()):
+            histogram_lines("cemention_mongo_command_duration_seconds", f'collection="{collection}",command="{command}"', histogram)
+
+        lines.append("# HELP cemention_mongo_command_failures_total Failed MongoDB commands by collection")
+        lines.append("# TYPE cemention_mongo_command_failures_total counter")
+        for (collection, command), count in sorted(self.mongo_failures.items()):
+            lines.append(f'cemention_mongo_command_failures_total{{collection="{collection}",command="{command}"}} {count}')
+
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str):
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def command_collection(command_name: str, command: dict):
+    """Collection a command targets ("-" for server/admin commands)"""
+    if command_name == "getMore":
+        return command.get("collection", "-")
+    target = command.get(command_name)
+    return target if isinstance(target, str) else "-"
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """pymongo listener timing every command per collection"""
+
+    def __init__(self, metrics: Metrics):
+        self.metrics = metrics
+        self._pending = {}  # request_id -> collection
+
+    def started(self, event):
+        self._pending[event.request_id] = command_collection(event.command_name, event.command)
+
+    def succeeded(self, event):
+        collection = self._pending.pop(event.request_id, "-")
+        self.metrics.record_command(collection, event.command_name, event.duration_micros / 1000, False)
+
+    def failed(self, event):
+        collection = self._pending.pop(event.request_id, "-")
+        self.metrics.record_command(collection, event.command_name, event.duration_micros / 1000, True)
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing each HTTP request under its route template"""
+
+    def __init__(self, app, metrics: "Metrics"):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # FastAPI records the matched route in the scope; templates keep label cardinality bounded
+            route = scope.get("route")
+            label = getattr(route, "path", None) or ("/static" if scope["path"].startswith("/static/") else "unmatched")
+            self.metrics.observe_request(scope["method"], label, status, (time.perf_counter() - start) * 1000)
+            self.metrics.fold_commands()
+
+
+metrics = Metrics()
+mongo_command_metrics = MongoCommandMetrics(metrics)
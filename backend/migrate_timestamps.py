@@ -0,0 +1,109 @@
+"""Rewrite ISO-8601 string timestamps as native BSON dates.
+
+Older documents stored created_at/updated_at as isoformat() strings. This walks
+each collection in _id order, converts any string timestamp fields with batched
+unordered bulk_write calls, and checkpoints the last processed _id in the
+`migrations` collection so an interrupted run resumes where it stopped.
+
+Usage:
+    python migrate_timestamps.py [--batch-size 1000] [--collections orders users] [--dry-run] [--restart]
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timezone
+
+from pymongo import UpdateOne
+
+from database import client, db
+
+TIMESTAMP_FIELDS = {
+    "users": ["created_at", "updated_at"],
+    "products": ["created_at", "updated_at"],
+    "addresses": ["created_at"],
+    "carts": ["updated_at"],
+    "orders": ["created_at", "updated_at"],
+    "request_orders": ["created_at"],
+}
+
+MIGRATION_ID = "timestamps_to_dates"
+
+
+def parse_timestamp(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+async def migrate_collection(name, fields, batch_size, dry_run, restart):
+    collection = db[name]
+    checkpoint_id = f"{MIGRATION_ID}:{name}"
+
+    query = {"$or": [{field: {"$type": "string"}} for field in fields]}
+    checkpoint = None if restart else await db.migrations.find_one({"_id": checkpoint_id})
+    if checkpoint and checkpoint.get("last_id") is not None:
+        query["_id"] = {"$gt": checkpoint["last_id"]}
+
+    projection = {field: 1 for field in fields}
+    converted = 0
+    skipped = 0
+    started = time.perf_counter()
+
+    while True:
+        docs = await collection.find(query, projection).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not docs:
+            break
+
+        ops = []
+        for doc in docs:
+            updates = {}
+            for field in fields:
+                value = doc.get(field)
+                if isinstance(value, str):
+                    try:
+                        updates[field] = parse_timestamp(value)
+                    except ValueError:
+                        skipped += 1
+            if updates:
+                ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": updates}))
+
+        last_id = docs[-1]["_id"]
+        if ops and not dry_run:
+            await collection.bulk_write(ops, ordered=False)
+        if not dry_run:
+            await db.migrations.update_one(
+                {"_id": checkpoint_id},
+                {"$set": {"last_id": last_id, "updated_at": datetime.now(timezone.utc)}},
+                upsert=True
+            )
+
+        converted += len(ops)
+        query["_id"] = {"$gt": last_id}
+        print(f"  {name}: {converted} documents converted", end="\r", flush=True)
+
+    elapsed = time.perf_counter() - started
+    note = " (dry run)" if dry_run else ""
+    print(f"  {name}: {converted} documents converted, {skipped} unparseable values left as-is in {elapsed:.1f}s{note}")
+
+
+async def run(collections, batch_size, dry_run, restart):
+    for name in collections:
+        await migrate_collection(name, TIMESTAMP_FIELDS[name], batch_size, dry_run, restart)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert string timestamps to native BSON dates")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--collections", nargs="+", choices=sorted(TIMESTAMP_FIELDS), default=list(TIMESTAMP_FIELDS))
+    parser.add_argument("--dry-run", action="store_true", help="report what would change without writing")
+    parser.add_argument("--restart", action="store_true", help="ignore saved checkpoints and scan from the beginning")
+    args = parser.parse_args()
+
+    print("Migrating timestamps...")
+    asyncio.run(run(args.collections, args.batch_size, args.dry_run, args.restart))
+    client.close()
+
+
+if __name__ == "__main__":
+    main()
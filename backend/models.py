@@ -4,6 +4,8 @@ from datetime import datetime, timezone
 from enum import Enum
 import uuid
 
+from ids import new_id, order_number
+
 # Enums
 class UserRole(str, Enum):
     DEALER = "DEALER"
@@ -36,6 +38,17 @@ class OrderStatus(str, Enum):
     DELIVERED = "DELIVERED"
     CANCELLED = "CANCELLED"
 
+# Order status changes an admin may make: forward along the delivery pipeline
+# (skipping steps is fine), or cancel anything not yet delivered
+ORDER_STATUS_TRANSITIONS = {
+    OrderStatus.PENDING: {OrderStatus.PAYMENT_RECEIVED, OrderStatus.ASSIGNED, OrderStatus.OUT_FOR_DELIVERY, OrderStatus.DELIVERED, OrderStatus.CANCELLED},
+    OrderStatus.PAYMENT_RECEIVED: {OrderStatus.ASSIGNED, OrderStatus.OUT_FOR_DELIVERY, OrderStatus.DELIVERED, OrderStatus.CANCELLED},
+    OrderStatus.ASSIGNED: {OrderStatus.OUT_FOR_DELIVERY, OrderStatus.DELIVERED, OrderStatus.CANCELLED},
+    OrderStatus.OUT_FOR_DELIVERY: {OrderStatus.DELIVERED, OrderStatus.CANCELLED},
+    OrderStatus.DELIVERED: set(),
+    OrderStatus.CANCELLED: set(),
+}
+
 class RequestOrderStatus(str, Enum):
     PENDING = "PENDING"
     APPROVED = "APPROVED"
@@ -57,12 +70,21 @@ class UserCreate(UserBase):
 
 class User(UserBase):
     model_config = ConfigDict(extra="ignore")
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     status: UserStatus = UserStatus.PENDING
     is_active: bool = True
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+class TokenUser(BaseModel):
+    """Authenticated identity taken from access token claims"""
+    id: str
+    role: UserRole
+    status: UserStatus
+
+class BulkUserIds(BaseModel):
+    user_ids: List[str]
+
 # OTP Models
 class OTPRequest(BaseModel):
     phone: str
@@ -80,7 +102,7 @@ class OTPResponse(BaseModel):
 # Product Models
 class Product(BaseModel):
     model_config = ConfigDict(extra="ignore")
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     name: str
     brand: str
     description: Optional[str] = None
@@ -152,6 +174,12 @@ class CartItemAdd(BaseModel):
     product_id: str
     quantity: int
 
+class CartItemUpdate(BaseModel):
+    quantity: int
+
+class CartSet(BaseModel):
+    items: List[CartItemAdd]
+
 # Order Models
 class OrderItem(BaseModel):
     product_id: str
@@ -162,9 +190,9 @@ class OrderItem(BaseModel):
 
 class Order(BaseModel):
     model_config = ConfigDict(extra="ignore")
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     user_id: str
-    order_number: str = Field(default_factory=lambda: f"ORD{datetime.now().strftime('%Y%m%d%H%M%S')}{uuid.uuid4().hex[:6].upper()}")
+    order_number: str = Field(default_factory=lambda data: order_number(data["id"]))
     items: List[OrderItem]
     subtotal: int
     gst_amount: int = 0
@@ -192,10 +220,14 @@ class OrderUpdate(BaseModel):
     driver_mobile: Optional[str] = None
     vehicle_number: Optional[str] = None
 
+class BulkOrderStatusUpdate(BaseModel):
+    order_ids: List[str]
+    order_status: OrderStatus
+
 # Request Order Models
 class RequestOrder(BaseModel):
     model_config = ConfigDict(extra="ignore")
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     user_id: str
     cement_brand: str
     quantity: int
@@ -223,6 +255,10 @@ class LoginResponse(BaseModel):
     message: str
     user: Optional[User] = None
     token: Optional[str] = None
+    refresh_token: Optional[str] = None
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
 class ProductWithPrice(Product):
     user_price: int
@@ -1,51 +1,77 @@
 import os
-from twilio.rest import Client
+import hashlib
+import hmac
 from datetime import datetime, timedelta, timezone
 import random
+from pymongo import ReturnDocument
 from database import otp_collection
-
-# Twilio configuration - will be set from .env
-TWILIO_ACCOUNT_SID = os.environ.get("TWILIO_ACCOUNT_SID", "")
-TWILIO_AUTH_TOKEN = os.environ.get("TWILIO_AUTH_TOKEN", "")
-TWILIO_PHONE_NUMBER = os.environ.get("TWILIO_PHONE_NUMBER", "")
+from sms import SMSDeliveryQueue, build_provider
 
 # For development/demo mode
 DEMO_MODE = os.environ.get("OTP_DEMO_MODE", "true").lower() == "true"
 
+OTP_TTL_MINUTES = 5
+OTP_MAX_ATTEMPTS = int(os.environ.get("OTP_MAX_ATTEMPTS", "5"))
+# Codes are stored as keyed hashes, never in plain text
+OTP_HASH_SECRET = os.environ.get("OTP_HASH_SECRET", os.environ.get("JWT_SECRET_KEY", "cemention-otp-secret")).encode()
+
+def hash_otp(phone: str, otp: str) -> str:
+    return hmac.new(OTP_HASH_SECRET, f"{phone}:{otp}".encode(), hashlib.sha256).hexdigest()
+
 class OTPService:
     def __init__(self):
-        self.client = None
-        if TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN and not DEMO_MODE:
-            self.client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+        # SMS goes out through a background queue so a slow gateway never blocks a request
+        self.sms_queue = None
+        if not DEMO_MODE:
+            provider = build_provider()
+            if provider:
+                self.sms_queue = SMSDeliveryQueue(provider)
+    
+    def start(self):
+        if self.sms_queue:
+            self.sms_queue.start()
+    
+    async def stop(self):
+        if self.sms_queue:
+            await self.sms_queue.stop()
     
     async def send_otp(self, phone: str):
         # Generate 6-digit OTP
         otp = str(random.randint(100000, 999999))
         
-        # Store OTP in database with expiry
-        expiry = datetime.now(timezone.utc) + timedelta(minutes=5)
+        otp_hash = hash_otp(phone, otp)
+        
+        # Store OTP hash with a native-date expiry; the TTL index on expires_at purges it
+        expires_at = datetime.now(timezone.utc) + timedelta(minutes=OTP_TTL_MINUTES)
         await otp_collection.update_one(
             {"phone": phone},
             {"$set": {
                 "phone": phone,
-                "otp": otp,
-                "expiry": expiry.isoformat(),
-                "verified": False
-            }},
+                "otp_hash": otp_hash,
+                "expires_at": expires_at,
+                "verified": False,
+                "attempts": 0,
+                "delivery_status": "QUEUED" if self.sms_queue else "DEMO"
+            },
+            "$unset": {"otp": "", "expiry": "", "sid": "", "delivery_attempts": "", "delivery_error": "", "sent_at": ""}},
             upsert=True
         )
         
-        # Send OTP via Twilio (if not in demo mode)
-        if self.client and not DEMO_MODE:
-            try:
-                message = self.client.messages.create(
-                    body=f"Your Cemention verification code is: {otp}. Valid for 5 minutes.",
-                    from_=TWILIO_PHONE_NUMBER,
-                    to=phone
-                )
-                return {"success": True, "message": "OTP sent successfully", "sid": message.sid}
-            except Exception as e:
-                return {"success": False, "message": f"Failed to send OTP: {str(e)}"}
+        # Queue OTP SMS (if not in demo mode)
+        if self.sms_queue:
+            async def record_status(fields):
+                # Only touch the document if it still holds this OTP
+                await otp_collection.update_one({"phone": phone, "otp_hash": otp_hash}, {"$set": fields})
+            
+            queued = self.sms_queue.submit(
+                phone,
+                f"Your Cemention verification code is: {otp}. Valid for {OTP_TTL_MINUTES} minutes.",
+                record_status
+            )
+            if not queued:
+                await record_status({"delivery_status": "REJECTED"})
+                return {"success": False, "message": "Failed to send OTP: SMS service busy, please retry"}
+            return {"success": True, "message": "OTP sent successfully"}
         else:
             # Demo mode - return OTP in response
             print(f"DEBUG: DEMO_MODE = {DEMO_MODE}, OTP = {otp}")
@@ -56,30 +82,44 @@ class OTPService:
             }
     
     async def verify_otp(self, phone: str, otp: str):
-        # Get OTP from database
-        otp_doc = await otp_collection.find_one({"phone": phone})
+        now = datetime.now(timezone.utc)
+        
+        # Match and consume the OTP in one atomic round trip
+        otp_doc = await otp_collection.find_one_and_update(
+            {
+                "phone": phone,
+                "otp_hash": hash_otp(phone, otp),
+                "verified": False,
+                "expires_at": {"$gt": now},
+                "attempts": {"$lt": OTP_MAX_ATTEMPTS}
+            },
+            {"$set": {"verified": True, "verified_at": now}},
+            projection={"_id": 1}
+        )
+        if otp_doc:
+            return {"success": True, "message": "OTP verified successfully"}
+        
+        # Failed - count the attempt and work out why
+        otp_doc = await otp_collection.find_one_and_update(
+            {"phone": phone},
+            {"$inc": {"attempts": 1}},
+            projection={"_id": 0, "verified": 1, "expires_at": 1, "attempts": 1},
+            return_document=ReturnDocument.AFTER
+        )
         
         if not otp_doc:
             return {"success": False, "message": "No OTP found for this phone number"}
         
-        # Check if already verified
         if otp_doc.get("verified"):
             return {"success": False, "message": "OTP already used"}
         
-        # Check expiry
-        expiry = datetime.fromisoformat(otp_doc["expiry"])
-        if datetime.now(timezone.utc) > expiry:
+        expires_at = otp_doc.get("expires_at")
+        if not expires_at or expires_at <= now:
             return {"success": False, "message": "OTP has expired"}
         
-        # Verify OTP
-        if otp_doc["otp"] == otp:
-            # Mark as verified
-            await otp_collection.update_one(
-                {"phone": phone},
-                {"$set": {"verified": True}}
-            )
-            return {"success": True, "message": "OTP verified successfully"}
-        else:
-            return {"success": False, "message": "Invalid OTP"}
+        if otp_doc["attempts"] > OTP_MAX_ATTEMPTS:
+            return {"success": False, "message": "Too many attempts. Please request a new OTP"}
+        
+        return {"success": False, "message": "Invalid OTP"}
 
 otp_service = OTPService()
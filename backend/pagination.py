@@ -0,0 +1,78 @@
+import base64
+import json
+from datetime import datetime
+
+from fastapi import HTTPException, Query, Response
+
+# Keyset pagination over (created_at, id). The cursor for the next page is
+# returned in the X-Next-Cursor response header so list bodies stay plain arrays.
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class PageParams:
+    """Query parameters shared by all paginated list endpoints"""
+
+    def __init__(
+        self,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        cursor: str = Query(None, description="Value of X-Next-Cursor from the previous page"),
+    ):
+        self.limit = limit
+        self.cursor = cursor
+
+
+def encode_cursor(doc: dict) -> str:
+    created_at = doc["created_at"]
+    # Remember whether the key was a native date or a not-yet-migrated ISO string
+    is_date = isinstance(created_at, datetime)
+    if is_date:
+        created_at = created_at.isoformat()
+    raw = json.dumps([created_at, doc["id"], is_date], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    try:
+        created_at, doc_id, is_date = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        # Only plain values: the cursor is client input that ends up inside the query
+        if not isinstance(created_at, str) or not isinstance(doc_id, str) or not isinstance(is_date, bool):
+            raise ValueError("cursor values must be strings")
+        if is_date:
+            created_at = datetime.fromisoformat(created_at)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return created_at, doc_id
+
+
+async def paginate(collection, query: dict, page: PageParams, response: Response, ascending: bool = False):
+    """Fetch one page of `query` ordered by (created_at, id), newest first unless `ascending`"""
+    op = "$gt" if ascending else "$lt"
+    direction = 1 if ascending else -1
+
+    if page.cursor:
+        created_at, doc_id = decode_cursor(page.cursor)
+        after = {"$or": [
+            {"created_at": {op: created_at}},
+            {"created_at": created_at, "id": {op: doc_id}},
+        ]}
+        # Comparisons only match values of the same BSON type, and strings sort
+        # before dates. Until migrate_timestamps.py has run, keep the other type's
+        # rows reachable when the page boundary crosses from one type to the other.
+        if isinstance(created_at, datetime) and not ascending:
+            after["$or"].append({"created_at": {"$type": "string"}})
+        elif isinstance(created_at, str) and ascending:
+            after["$or"].append({"created_at": {"$type": "date"}})
+        query = {"$and": [query, after]} if query else after
+
+    # Fetch one extra document to know whether another page exists
+    docs = await collection.find(query, {"_id": 0}).sort(
+        [("created_at", direction), ("id", direction)]
+    ).limit(page.limit + 1).to_list(page.limit + 1)
+
+    if len(docs) > page.limit:
+        docs = docs[:page.limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(docs[-1])
+
+    return docs
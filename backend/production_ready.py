@@ -1,20 +1,31 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Request
+from fastapi.responses import Response
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-import os
+import asyncio
 import logging
+import re
 from pathlib import Path
-from datetime import datetime, timezone
 from typing import List
 
 from models import *
 from database import *
-from auth import get_current_user, require_admin, require_approved, create_access_token
+from auth import get_current_user, require_approved, create_user_tokens, note_token_version, verify_token
 from otp_service import otp_service
+from catalog import catalog
+from pagination import NEXT_CURSOR_HEADER
+from serialization import FastJSONResponse
+from metrics import METRICS_ENABLED, MetricsMiddleware, metrics
+from profiler import SLOW_QUERY_PROFILER_ENABLED, RequestContextMiddleware, slow_query_profiler
+from static_files import FrontendBuild
+from compression import CompressionMiddleware, preferred_encoding
+from etags import bump_versions, etag_matches, not_modified, variant_etag, with_etag
+from events import order_events
+from stats import increment_counters, user_deltas
 from routes_orders import orders_router
+from routes_cart import cart_router
 from routes_admin import admin_router
+from routes_export import export_router
 
 # ================= BASIC SETUP =================
 
@@ -22,12 +33,26 @@ BASE_DIR = Path(__file__).parent
 PROJECT_ROOT = BASE_DIR.parent
 load_dotenv(BASE_DIR / ".env")
 
-app = FastAPI(title="Cemention API", version="1.0.0")
+app = FastAPI(title="Cemention API", version="1.0.0", default_response_class=FastJSONResponse)
 api_router = APIRouter(prefix="/api")
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("cemention")
 
+_TOKEN_PARAM = re.compile(r"([?&]token=)[^&\s]*")
+
+
+class RedactQueryTokens(logging.Filter):
+    """Keep ?token= values (event stream tokens) out of the access log"""
+
+    def filter(self, record):
+        if isinstance(record.args, tuple):
+            record.args = tuple(_TOKEN_PARAM.sub(r"\1[redacted]", arg) if isinstance(arg, str) else arg for arg in record.args)
+        return True
+
+
+logging.getLogger("uvicorn.access").addFilter(RedactQueryTokens())
+
 # ================= AUTH =================
 
 @api_router.post("/auth/send-otp", response_model=OTPResponse)
@@ -60,13 +85,13 @@ async def register_user(user_data: UserCreate):
     user.status = UserStatus.PENDING if user.role in [UserRole.DEALER, UserRole.RETAILER] else UserStatus.APPROVED
 
     user_dict = user.model_dump()
-    user_dict["created_at"] = user_dict["created_at"].isoformat()
-    user_dict["updated_at"] = user_dict["updated_at"].isoformat()
 
     await users_collection.insert_one(user_dict)
+    await increment_counters(user_deltas(None, user.status))
+    await bump_versions("users")
 
-    token = create_access_token({"user_id": user.id})
-    return LoginResponse(success=True, message="Registration successful", user=user, token=token)
+    token, refresh_token = create_user_tokens(user)
+    return LoginResponse(success=True, message="Registration successful", user=user, token=token, refresh_token=refresh_token)
 
 
 @api_router.post("/auth/login", response_model=LoginResponse)
@@ -75,12 +100,26 @@ async def login(request: OTPRequest):
     if not user_doc:
         return LoginResponse(success=False, message="User not found")
 
-    user_doc["created_at"] = datetime.fromisoformat(user_doc["created_at"])
-    user_doc["updated_at"] = datetime.fromisoformat(user_doc["updated_at"])
+    user = User(**user_doc)
+    token, refresh_token = create_user_tokens(user, user_doc.get("token_version", 0))
+    return LoginResponse(success=True, message="Login successful", user=user, token=token, refresh_token=refresh_token)
+
+
+@api_router.post("/auth/refresh", response_model=LoginResponse)
+async def refresh_token(request: RefreshRequest):
+    payload = verify_token(request.refresh_token, token_type="refresh")
+
+    # Re-read the user so role/status changes made by an admin land in the new claims
+    user_doc = await users_collection.find_one({"id": payload["user_id"]}, {"_id": 0})
+    if not user_doc:
+        raise HTTPException(status_code=401, detail="User not found")
+
+    token_version = user_doc.get("token_version", 0)
+    note_token_version(payload["user_id"], token_version)
 
     user = User(**user_doc)
-    token = create_access_token({"user_id": user.id})
-    return LoginResponse(success=True, message="Login successful", user=user, token=token)
+    token, refresh_token = create_user_tokens(user, token_version)
+    return LoginResponse(success=True, message="Token refreshed", user=user, token=token, refresh_token=refresh_token)
 
 
 @api_router.get("/auth/me", response_model=User)
@@ -90,65 +129,35 @@ async def get_me(current_user: User = Depends(get_current_user)):
 # ================= PRODUCTS =================
 
 @api_router.get("/products", response_model=List[ProductWithPrice])
-async def get_products(current_user: User = Depends(require_approved)):
-    products = await products_collection.find({"is_active": True}, {"_id": 0}).to_list(1000)
-    result = []
-
-    for p in products:
-        p["created_at"] = datetime.fromisoformat(p["created_at"])
-        p["updated_at"] = datetime.fromisoformat(p["updated_at"])
-        product = Product(**p)
-
-        price = (
-            product.base_price_dealer if current_user.role == UserRole.DEALER else
-            product.base_price_retailer if current_user.role == UserRole.RETAILER else
-            product.base_price_customer
-        )
-
-        result.append(ProductWithPrice(**product.model_dump(), user_price=price))
-
-    return result
-
-# ================= CART =================
-
-@api_router.post("/cart/add")
-async def add_to_cart(item: CartItemAdd, current_user: User = Depends(require_approved)):
-    if item.quantity < 100:
-        raise HTTPException(status_code=400, detail="Minimum order quantity is 100 bags")
-
-    product = await products_collection.find_one({"id": item.product_id}, {"_id": 0})
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-
-    product_obj = Product(**{
-        **product,
-        "created_at": datetime.fromisoformat(product["created_at"]),
-        "updated_at": datetime.fromisoformat(product["updated_at"])
-    })
-
-    price = (
-        product_obj.base_price_dealer if current_user.role == UserRole.DEALER else
-        product_obj.base_price_retailer if current_user.role == UserRole.RETAILER else
-        product_obj.base_price_customer
-    )
-
-    await carts_collection.update_one(
-        {"user_id": current_user.id},
-        {"$set": {
-            "user_id": current_user.id,
-            "items": [{"product_id": item.product_id, "quantity": item.quantity, "price_per_bag": price}],
-            "updated_at": datetime.now(timezone.utc).isoformat()
-        }},
-        upsert=True
-    )
-
-    return {"success": True, "message": "Item added to cart"}
+async def get_products(request: Request, current_user: TokenUser = Depends(require_approved)):
+    # Served from the in-process catalog as pre-serialized (and pre-compressed) JSON for the user's price tier
+    encoding = preferred_encoding(request.headers.get("accept-encoding"))
+    body, etag = await catalog.priced_payload(current_user.role, encoding)
+    etag = variant_etag(etag, encoding)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
+
+    response = with_etag(Response(content=body, media_type="application/json"), etag)
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    return response
 
 # ================= ROUTERS & MIDDLEWARE =================
 
 app.include_router(api_router)
+app.include_router(cart_router)
 app.include_router(orders_router)
 app.include_router(admin_router)
+app.include_router(export_router)
+
+# Innermost, so the metrics below include compression time
+app.add_middleware(CompressionMiddleware)
+
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware, metrics=metrics)
+
+if SLOW_QUERY_PROFILER_ENABLED:
+    app.add_middleware(RequestContextMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -156,31 +165,44 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 # ================= FRONTEND SERVING =================
 
 FRONTEND_BUILD = PROJECT_ROOT / "frontend" / "build"
-
-if FRONTEND_BUILD.exists():
-    app.mount(
-        "/",
-        StaticFiles(directory=FRONTEND_BUILD, html=True),
-        name="frontend",
-    )
-
-# 🔑 SPA fallback for React routing
-@app.get("/{full_path:path}")
-async def serve_spa(full_path: str):
-    index_file = FRONTEND_BUILD / "index.html"
-    if index_file.exists():
-        return FileResponse(index_file)
-    return {"detail": "Frontend not built"}
-
-# ================= SHUTDOWN =================
+frontend = FrontendBuild(FRONTEND_BUILD)
+
+# Build files and the SPA fallback for React routing, served from memory / precompressed variants
+@app.api_route("/{full_path:path}", methods=["GET", "HEAD"], include_in_schema=False)
+async def serve_spa(full_path: str, request: Request):
+    if full_path == "api" or full_path.startswith("api/"):
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not frontend.exists():
+        return {"detail": "Frontend not built"}
+    return frontend.response(full_path, request)
+
+# ================= STARTUP / SHUTDOWN =================
+
+@app.on_event("startup")
+async def startup_db():
+    if SLOW_QUERY_PROFILER_ENABLED:
+        slow_query_profiler.start(client)
+    if frontend.exists():
+        try:
+            written = await asyncio.to_thread(frontend.precompress)
+            logger.info("Precompressed %d frontend build files", written)
+        except OSError as e:
+            # Read-only build directory - assets are served uncompressed
+            logger.warning("Could not precompress frontend build: %s", e)
+    await ensure_indexes()
+    otp_service.start()
+    await order_events.start(db)
 
 @app.on_event("shutdown")
 async def shutdown_db():
+    await order_events.stop()
+    await otp_service.stop()
     try:
         client.close()
     except Exception:
@@ -0,0 +1,283 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+from pymongo import monitoring
+
+from metrics import command_collection
+
+# Opt-in: slow commands are logged by query shape (values replaced by "?", so no
+# user data reaches the log) with the route that issued them and a sampled explain.
+SLOW_QUERY_PROFILER_ENABLED = os.environ.get("SLOW_QUERY_PROFILER_ENABLED", "false").lower() == "true"
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get("SLOW_QUERY_THRESHOLD_MS", "100"))
+SLOW_QUERY_EXPLAIN_RATE = float(os.environ.get("SLOW_QUERY_EXPLAIN_RATE", "0.1"))
+SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS = float(os.environ.get("SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS", "300"))
+# Relative paths are resolved against the backend directory
+SLOW_QUERY_LOG_FILE = str(Path(__file__).parent / os.environ.get("SLOW_QUERY_LOG_FILE", "logs/slow_queries.log"))
+SLOW_QUERY_LOG_MAX_BYTES = int(os.environ.get("SLOW_QUERY_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+SLOW_QUERY_LOG_BACKUPS = int(os.environ.get("SLOW_QUERY_LOG_BACKUPS", "5"))
+
+logger = logging.getLogger("cemention.profiler")
+
+# ASGI scope of the request being served. Motor runs each operation in its executor
+# with a copy of the caller's context, so the listener can see which route issued it.
+request_scope = ContextVar("request_scope", default=None)
+
+EXPLAINABLE = {"find", "aggregate", "count", "distinct", "findAndModify", "update", "delete"}
+# Command fields that explain rejects or that only make sense for the original call
+_NOT_EXPLAINED = {"lsid", "txnNumber", "autocommit", "startTransaction", "writeConcern", "readConcern"}
+
+
+def find_stages(plan, stage):
+    """Yield every plan node (at any depth) whose stage equals `stage`"""
+    if isinstance(plan, dict):
+        if plan.get("stage") == stage:
+            yield plan
+        for value in plan.values():
+            yield from find_stages(value, stage)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from find_stages(value, stage)
+
+
+def _stages(plan):
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from _stages(value)
+
+
+def plan_summary(explain: dict):
+    """Stages, indexes and scan/sort flags of an explain result's winning plan"""
+    planner = explain.get("queryPlanner") or explain
+    if "stages" in explain:  # aggregate explain: the $cursor stage holds the query plan
+        planner = next((s["$cursor"]["queryPlanner"] for s in explain["stages"] if "$cursor" in s), planner)
+    plan = planner.get("winningPlan", {})
+    return {
+        "stages": list(dict.fromkeys(_stages(plan))),
+        "indexes": sorted({s.get("indexName") for s in find_stages(plan, "IXSCAN")} - {None}),
+        "collscan": any(find_stages(plan, "COLLSCAN")),
+        "in_memory_sort": any(find_stages(plan, "SORT")),
+    }
+
+
+def value_shape(value):
+    """Replace values with "?" while keeping field names and operators"""
+    if isinstance(value, dict):
+        return {key: value_shape(item) for key, item in value.items()}
+    if isinstance(value, list):
+        shapes = []
+        for item in value:
+            shape = value_shape(item)
+            if shape not in shapes:
+                shapes.append(shape)
+        return shapes
+    return "?"
+
+
+def _pipeline_shape(pipeline):
+    shape = []
+    for stage in pipeline:
+        name = next(iter(stage), "?")
+        if name == "$match":
+            shape.append({name: value_shape(stage[name])})
+        elif name == "$sort":
+            shape.append(stage)
+        else:
+            shape.append(name)
+    return shape
+
+
+def command_shape(command_name: str, command: dict):
+    """Normalized query shape of a command - what the planner sees, minus the values"""
+    if command_name == "find":
+        shape = {"filter": value_shape(command.get("filter", {}))}
+        if command.get("sort"):
+            shape["sort"] = command["sort"]
+        return shape
+    if command_name == "aggregate":
+        return {"pipeline": _pipeline_shape(command.get("pipeline", []))}
+    if command_name == "findAndModify":
+        shape = {"query": value_shape(command.get("query", {}))}
+        if command.get("sort"):
+            shape["sort"] = command["sort"]
+        return shape
+    if command_name in ("update", "delete"):
+        statements = command.get("updates" if command_name == "update" else "deletes", [])
+        return {"q": value_shape([statement.get("q", {}) for statement in statements])}
+    if command_name == "count":
+        return {"query": value_shape(command.get("query", {}))}
+    if command_name == "distinct":
+        return {"key": command.get("key"), "query": value_shape(command.get("query", {}))}
+    return {}
+
+
+def _route_label():
+    scope = request_scope.get()
+    if scope is None:
+        return None
+    route = scope.get("route")
+    return f"{scope.get('method')} {getattr(route, 'path', None) or scope.get('path')}"
+
+
+class SlowQueryProfiler(monitoring.CommandListener):
+    """pymongo listener logging commands slower than the threshold, grouped by shape"""
+
+    def __init__(self, threshold_ms: float = SLOW_QUERY_THRESHOLD_MS, explain_rate: float = SLOW_QUERY_EXPLAIN_RATE):
+        self.threshold_ms = threshold_ms
+        self.explain_rate = explain_rate
+        self.shapes = {}
+        self._pending = {}  # request_id -> (command, route)
+        self._lock = threading.Lock()
+        self._loop = None
+        self._client = None
+        self._log = None
+
+    def start(self, client):
+        """Enable sampled explains (needs the running loop) and open the rotating log"""
+        self._loop = asyncio.get_running_loop()
+        self._client = client
+        if self._log is None:
+            Path(SLOW_QUERY_LOG_FILE).parent.mkdir(parents=True, exist_ok=True)
+            handler = RotatingFileHandler(SLOW_QUERY_LOG_FILE, maxBytes=SLOW_QUERY_LOG_MAX_BYTES, backupCount=SLOW_QUERY_LOG_BACKUPS)
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self._log = logging.getLogger("cemention.slow_queries")
+            self._log.setLevel(logging.INFO)
+            self._log.propagate = False
+            self._log.addHandler(handler)
+
+    def started(self, event):
+        if event.command_name != "explain":
+            self._pending[event.request_id] = (event.command, _route_label())
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        self._finish(event)
+
+    def _finish(self, event):
+        pending = self._pending.pop(event.request_id, None)
+        duration_ms = event.duration_micros / 1000
+        if pending is None or duration_ms < self.threshold_ms:
+            return
+
+        command, route = pending
+        collection = command_collection(event.command_name, command)
+        shape = command_shape(event.command_name, command)
+        key = f"{collection}.{event.command_name} {json.dumps(shape, default=str)}"
+        now = time.time()
+
+        with self._lock:
+            entry = self.shapes.get(key)
+            if entry is None:
+                entry = self.shapes[key] = {
+                    "collection": collection,
+                    "command": event.command_name,
+                    "shape": shape,
+                    "count": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "routes": {},
+                    "explain": None,
+                    "explained_at": 0.0,
+                }
+            entry["count"] += 1
+            entry["total_ms"] += duration_ms
+            entry["max_ms"] = max(entry["max_ms"], duration_ms)
+            entry["last_seen"] = now
+            entry["routes"][route] = entry["routes"].get(route, 0) + 1
+            explain = (
+                event.command_name in EXPLAINABLE
+                and self._loop is not None
+                and now - entry["explained_at"] >= SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS
+                and random.random() < self.explain_rate
+            )
+            if explain:
+                entry["explained_at"] = now
+
+        self._write({
+            "ts": datetime.now(timezone.utc).isoformat(),
+            "ms": round(duration_ms, 1),
+            "route": route,
+            "failed": isinstance(event, monitoring.CommandFailedEvent),
+            "shape": key,
+        })
+        if explain:
+            body = {k: v for k, v in command.items() if not k.startswith("$") and k not in _NOT_EXPLAINED}
+            self._loop.call_soon_threadsafe(self._schedule_explain, key, event.database_name, body)
+
+    def _schedule_explain(self, key, database_name, body):
+        asyncio.ensure_future(self._explain(key, database_name, body))
+
+    async def _explain(self, key, database_name, body):
+        try:
+            result = await self._client[database_name].command({"explain": body, "verbosity": "queryPlanner"})
+        except Exception as e:
+            logger.warning("Explain failed for %s: %s", key, e)
+            return
+        summary = plan_summary(result)
+        with self._lock:
+            self.shapes[key]["explain"] = summary
+        self._write({"ts": datetime.now(timezone.utc).isoformat(), "shape": key, "plan": summary})
+
+    def _write(self, record):
+        if self._log is not None:
+            self._log.info(json.dumps(record, default=str))
+
+    def summary(self, limit: int = 50):
+        """Slow shapes, most total time first"""
+        with self._lock:
+            entries = [dict(entry, routes=dict(entry["routes"])) for entry in self.shapes.values()]
+        entries.sort(key=lambda entry: entry["total_ms"], reverse=True)
+        return {
+            "enabled": SLOW_QUERY_PROFILER_ENABLED,
+            "threshold_ms": self.threshold_ms,
+            "log_file": SLOW_QUERY_LOG_FILE,
+            "shapes": [
+                {
+                    "collection": entry["collection"],
+                    "command": entry["command"],
+                    "shape": entry["shape"],
+                    "count": entry["count"],
+                    "total_ms": round(entry["total_ms"], 1),
+                    "mean_ms": round(entry["total_ms"] / entry["count"], 1),
+                    "max_ms": round(entry["max_ms"], 1),
+                    "last_seen": datetime.fromtimestamp(entry["last_seen"], timezone.utc).isoformat(),
+                    "routes": {str(route): count for route, count in entry["routes"].items()},
+                    "explain": entry["explain"],
+                }
+                for entry in entries[:limit]
+            ],
+        }
+
+
+class RequestContextMiddleware:
+    """ASGI middleware exposing the request scope to the profiler through a contextvar"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        token = request_scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            request_scope.reset(token)
+
+
+slow_query_profiler = SlowQueryProfiler()
@@ -1,195 +1,496 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Header, Request, Response
+from pymongo import ReturnDocument, InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+from pydantic import ValidationError
 from typing import List, Optional
 from datetime import datetime, timezone
+import csv
+import hmac
+import io
+import json
+import os
+import time
+from collections import Counter
 
 from models import *
 from database import *
-from auth import require_admin
+from auth import require_admin, get_token_user, note_token_version
+from user_cache import user_cache
+from catalog import catalog
+from etags import bump_versions, list_etag, with_etag
+from events import order_events
+from inventory import release_stock
+from pagination import PageParams, paginate
+from serialization import trusted_response, trusted_list_response
+from metrics import metrics
+from otp_service import otp_service
+from profiler import slow_query_profiler
+from stats import get_summary, rebuild_summary, increment_counters, user_deltas, order_deltas
 
 admin_router = APIRouter(prefix="/api/admin", tags=["admin"])
 
+MAX_BULK_ROWS = 5000
+
+# Static bearer token for Prometheus scrapes (access tokens are too short-lived for a scraper)
+METRICS_SCRAPE_TOKEN = os.environ.get("METRICS_SCRAPE_TOKEN", "")
+
+def _bulk_ids(ids: List[str]):
+    """De-duplicated ids of a bulk request, in request order"""
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        raise HTTPException(status_code=400, detail="No ids given")
+    if len(ids) > MAX_BULK_ROWS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_ROWS} ids per request")
+    return ids
+
+async def _bulk_apply(collection, operations, planned: List[str], stamp: datetime):
+    """Run conditional UpdateOnes in one bulk_write; return the ids actually updated.
+    
+    Each operation only matches the state read beforehand, so a document changed
+    concurrently is skipped. bulk_write only reports counts, so when something was
+    skipped the winners are found by the updated_at value this batch wrote.
+    """
+    if not operations:
+        return set()
+    result = await collection.bulk_write(operations, ordered=False)
+    if result.matched_count == len(operations):
+        return set(planned)
+    return set(await collection.distinct("id", {"id": {"$in": planned}, "updated_at": stamp}))
+
+def _bulk_outcomes(ids: List[str], outcomes: dict, applied: set):
+    results = []
+    for item_id in ids:
+        outcome = outcomes[item_id]
+        if outcome == "updated" and item_id not in applied:
+            outcome = "conflict"
+        results.append({"id": item_id, "outcome": outcome})
+    return {"updated": len(applied), "results": results}
+
 # ============ USER MANAGEMENT ============
 
 @admin_router.get("/users/pending", response_model=List[User])
-async def get_pending_users(current_admin: User = Depends(require_admin)):
-    """Get all pending user approvals"""
-    users = await users_collection.find(
-        {"status": UserStatus.PENDING.value},
-        {"_id": 0}
-    ).to_list(1000)
+async def get_pending_users(request: Request, response: Response, page: PageParams = Depends(), current_admin: TokenUser = Depends(require_admin)):
+    """Get pending user approvals (oldest first, paginated; 304 if unchanged)"""
+    etag, unchanged = await list_etag(request, "users")
+    if unchanged:
+        return unchanged
     
-    for user in users:
-        user['created_at'] = datetime.fromisoformat(user['created_at'])
-        user['updated_at'] = datetime.fromisoformat(user['updated_at'])
+    users = await paginate(users_collection, {"status": UserStatus.PENDING.value}, page, response, ascending=True)
     
-    return [User(**user) for user in users]
+    return with_etag(trusted_list_response(User, users, response.headers), etag)
 
 @admin_router.get("/users", response_model=List[User])
-async def get_all_users(role: Optional[str] = None, current_admin: User = Depends(require_admin)):
-    """Get all users"""
+async def get_all_users(request: Request, response: Response, role: Optional[str] = None, page: PageParams = Depends(), current_admin: TokenUser = Depends(require_admin)):
+    """Get all users (newest first, paginated; 304 if unchanged)"""
+    etag, unchanged = await list_etag(request, "users")
+    if unchanged:
+        return unchanged
+    
     query = {}
     if role:
         query["role"] = role
     
-    users = await users_collection.find(query, {"_id": 0}).to_list(1000)
-    
-    for user in users:
-        user['created_at'] = datetime.fromisoformat(user['created_at'])
-        user['updated_at'] = datetime.fromisoformat(user['updated_at'])
+    users = await paginate(users_collection, query, page, response)
     
-    return [User(**user) for user in users]
+    return with_etag(trusted_list_response(User, users, response.headers), etag)
 
 @admin_router.patch("/users/{user_id}/approve")
-async def approve_user(user_id: str, current_admin: User = Depends(require_admin)):
+async def approve_user(user_id: str, current_admin: TokenUser = Depends(require_admin)):
     """Approve user registration"""
-    result = await users_collection.update_one(
-        {"id": user_id},
+    before = await users_collection.find_one_and_update(
+        {"id": user_id, "status": {"$ne": UserStatus.APPROVED.value}},
         {"$set": {
             "status": UserStatus.APPROVED.value,
-            "updated_at": datetime.now(timezone.utc).isoformat()
-        }}
+            "updated_at": datetime.now(timezone.utc)
+        }, "$inc": {"token_version": 1}},
+        projection={"_id": 0, "status": 1, "token_version": 1},
+        return_document=ReturnDocument.BEFORE
     )
     
-    if result.modified_count == 0:
+    if not before:
         raise HTTPException(status_code=404, detail="User not found")
     
+    # Outstanding tokens carry the old status claim - force a refresh
+    note_token_version(user_id, before.get("token_version", 0) + 1)
+    user_cache.invalidate(user_id)
+    await increment_counters(user_deltas(before["status"], UserStatus.APPROVED.value))
+    await bump_versions("users")
+    
     return {"success": True, "message": "User approved"}
 
 @admin_router.patch("/users/{user_id}/reject")
-async def reject_user(user_id: str, current_admin: User = Depends(require_admin)):
+async def reject_user(user_id: str, current_admin: TokenUser = Depends(require_admin)):
     """Reject user registration"""
-    result = await users_collection.update_one(
-        {"id": user_id},
+    before = await users_collection.find_one_and_update(
+        {"id": user_id, "status": {"$ne": UserStatus.REJECTED.value}},
         {"$set": {
             "status": UserStatus.REJECTED.value,
-            "updated_at": datetime.now(timezone.utc).isoformat()
-        }}
+            "updated_at": datetime.now(timezone.utc)
+        }, "$inc": {"token_version": 1}},
+        projection={"_id": 0, "status": 1, "token_version": 1},
+        return_document=ReturnDocument.BEFORE
     )
     
-    if result.modified_count == 0:
+    if not before:
         raise HTTPException(status_code=404, detail="User not found")
     
+    # Outstanding tokens carry the old status claim - force a refresh
+    note_token_version(user_id, before.get("token_version", 0) + 1)
+    user_cache.invalidate(user_id)
+    await increment_counters(user_deltas(before["status"], UserStatus.REJECTED.value))
+    await bump_versions("users")
+    
     return {"success": True, "message": "User rejected"}
 
+async def _bulk_set_user_status(user_ids: List[str], status: UserStatus):
+    user_ids = _bulk_ids(user_ids)
+    now = datetime.now(timezone.utc)
+    
+    before = {
+        doc["id"]: doc
+        async for doc in users_collection.find({"id": {"$in": user_ids}}, {"_id": 0, "id": 1, "status": 1, "token_version": 1})
+    }
+    
+    outcomes = {}
+    operations = []
+    for user_id in user_ids:
+        doc = before.get(user_id)
+        if not doc:
+            outcomes[user_id] = "not_found"
+        elif doc["status"] == status.value:
+            outcomes[user_id] = "unchanged"
+        else:
+            outcomes[user_id] = "updated"
+            operations.append(UpdateOne(
+                {"id": user_id, "status": doc["status"]},
+                {"$set": {"status": status.value, "updated_at": now}, "$inc": {"token_version": 1}}
+            ))
+    
+    planned = [user_id for user_id in user_ids if outcomes[user_id] == "updated"]
+    applied = await _bulk_apply(users_collection, operations, planned, now)
+    
+    deltas = Counter()
+    for user_id in applied:
+        # Outstanding tokens carry the old status claim - force a refresh
+        note_token_version(user_id, before[user_id].get("token_version", 0) + 1)
+        user_cache.invalidate(user_id)
+        deltas.update(user_deltas(before[user_id]["status"], status.value))
+    await increment_counters(deltas)
+    if applied:
+        await bump_versions("users")
+    
+    return _bulk_outcomes(user_ids, outcomes, applied)
+
+@admin_router.post("/users/bulk-approve")
+async def bulk_approve_users(bulk_data: BulkUserIds, current_admin: TokenUser = Depends(require_admin)):
+    """Approve many user registrations; per-id outcome: updated/unchanged/not_found/conflict"""
+    return await _bulk_set_user_status(bulk_data.user_ids, UserStatus.APPROVED)
+
+@admin_router.post("/users/bulk-reject")
+async def bulk_reject_users(bulk_data: BulkUserIds, current_admin: TokenUser = Depends(require_admin)):
+    """Reject many user registrations; per-id outcome: updated/unchanged/not_found/conflict"""
+    return await _bulk_set_user_status(bulk_data.user_ids, UserStatus.REJECTED)
+
 # ============ PRODUCT MANAGEMENT ============
 
 @admin_router.post("/products", response_model=Product)
-async def create_product(product_data: ProductCreate, current_admin: User = Depends(require_admin)):
+async def create_product(product_data: ProductCreate, current_admin: TokenUser = Depends(require_admin)):
     """Create new product"""
     product = Product(**product_data.model_dump())
     
     product_dict = product.model_dump()
-    product_dict['created_at'] = product_dict['created_at'].isoformat()
-    product_dict['updated_at'] = product_dict['updated_at'].isoformat()
     
     await products_collection.insert_one(product_dict)
+    catalog.invalidate()
+    await bump_versions("products")
     
     return product
 
+def _parse_bulk_rows(body: bytes, content_type: str):
+    """Rows of a bulk product upload - CSV with a header line, or a JSON array of objects"""
+    text = body.decode("utf-8-sig")
+    if "csv" in content_type:
+        # Empty cells mean "not given", like a missing JSON key
+        return [{k: v for k, v in row.items() if k and v not in (None, "")} for row in csv.DictReader(io.StringIO(text))]
+    
+    try:
+        rows = json.loads(text)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or CSV")
+    if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+        raise HTTPException(status_code=400, detail="Body must be a JSON array of objects")
+    return rows
+
+def _validation_message(error: ValidationError):
+    return "; ".join(f"{'.'.join(str(part) for part in e['loc'])}: {e['msg']}" for e in error.errors())
+
+@admin_router.post("/products/bulk")
+async def bulk_upsert_products(request: Request, current_admin: TokenUser = Depends(require_admin)):
+    """Create (rows without id) or update (rows with id) many products in one bulk write.
+    
+    Accepts a JSON array or CSV (Content-Type: text/csv). Row numbers in errors are
+    0-based positions in the upload; valid rows are applied even if others fail.
+    """
+    started = time.perf_counter()
+    rows = _parse_bulk_rows(await request.body(), request.headers.get("content-type", ""))
+    
+    if not rows:
+        raise HTTPException(status_code=400, detail="No rows to import")
+    if len(rows) > MAX_BULK_ROWS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_ROWS} rows per request")
+    
+    now = datetime.now(timezone.utc)
+    errors = []
+    operations = []
+    operation_rows = []  # operation index -> upload row
+    updates = {}
+    
+    for row_number, row in enumerate(rows):
+        product_id = row.get("id")
+        try:
+            if product_id:
+                update_data = {k: v for k, v in ProductUpdate(**row).model_dump().items() if v is not None}
+                if not update_data:
+                    errors.append({"row": row_number, "id": product_id, "error": "No fields to update"})
+                    continue
+                update_data["updated_at"] = now
+                updates[row_number] = product_id
+                operation = UpdateOne({"id": product_id}, {"$set": update_data})
+            else:
+                product = Product(**ProductCreate(**row).model_dump())
+                product_id = product.id
+                operation = InsertOne(product.model_dump())
+        except ValidationError as e:
+            errors.append({"row": row_number, "id": product_id, "error": _validation_message(e)})
+            continue
+        operations.append(operation)
+        operation_rows.append((row_number, product_id))
+    
+    # bulk_write only reports how many updates matched, so find unknown ids up front
+    if updates:
+        existing = set(await products_collection.distinct("id", {"id": {"$in": list(set(updates.values()))}}))
+        missing = {row_number for row_number, product_id in updates.items() if product_id not in existing}
+        if missing:
+            errors.extend({"row": n, "id": updates[n], "error": "Product not found"} for n in sorted(missing))
+            kept = [i for i, (row_number, _) in enumerate(operation_rows) if row_number not in missing]
+            operations = [operations[i] for i in kept]
+            operation_rows = [operation_rows[i] for i in kept]
+    
+    inserted = updated = 0
+    if operations:
+        try:
+            result = await products_collection.bulk_write(operations, ordered=False)
+            details = result.bulk_api_result
+        except BulkWriteError as e:
+            details = e.details
+            for write_error in details.get("writeErrors", []):
+                row_number, product_id = operation_rows[write_error["index"]]
+                errors.append({"row": row_number, "id": product_id, "error": write_error.get("errmsg", "Write failed")})
+        inserted = details.get("nInserted", 0)
+        updated = details.get("nMatched", 0)
+        catalog.invalidate()
+        await bump_versions("products")
+    
+    errors.sort(key=lambda e: e["row"])
+    
+    return {
+        "received": len(rows),
+        "inserted": inserted,
+        "updated": updated,
+        "failed": len(errors),
+        "errors": errors,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)
+    }
+
 @admin_router.get("/products", response_model=List[Product])
-async def get_all_products(current_admin: User = Depends(require_admin)):
-    """Get all products (including inactive)"""
-    products = await products_collection.find({}, {"_id": 0}).to_list(1000)
+async def get_all_products(request: Request, response: Response, page: PageParams = Depends(), current_admin: TokenUser = Depends(require_admin)):
+    """Get all products (including inactive, newest first, paginated; 304 if unchanged)"""
+    etag, unchanged = await list_etag(request, "products")
+    if unchanged:
+        return unchanged
     
-    for product in products:
-        product['created_at'] = datetime.fromisoformat(product['created_at'])
-        product['updated_at'] = datetime.fromisoformat(product['updated_at'])
+    products = await paginate(products_collection, {}, page, response)
     
-    return [Product(**product) for product in products]
+    return with_etag(trusted_list_response(Product, products, response.headers), etag)
 
 @admin_router.patch("/products/{product_id}", response_model=Product)
-async def update_product(product_id: str, product_data: ProductUpdate, current_admin: User = Depends(require_admin)):
+async def update_product(product_id: str, product_data: ProductUpdate, current_admin: TokenUser = Depends(require_admin)):
     """Update product"""
     update_data = {k: v for k, v in product_data.model_dump().items() if v is not None}
     
     if not update_data:
         raise HTTPException(status_code=400, detail="No fields to update")
     
-    update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
+    update_data["updated_at"] = datetime.now(timezone.utc)
     
-    result = await products_collection.update_one(
+    product = await products_collection.find_one_and_update(
         {"id": product_id},
-        {"$set": update_data}
+        {"$set": update_data},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
     )
     
-    if result.modified_count == 0:
+    if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
-    # Return updated product
-    product = await products_collection.find_one({"id": product_id}, {"_id": 0})
-    product['created_at'] = datetime.fromisoformat(product['created_at'])
-    product['updated_at'] = datetime.fromisoformat(product['updated_at'])
+    catalog.invalidate()
+    await bump_versions("products")
     
-    return Product(**product)
+    return trusted_response(Product, product)
 
 @admin_router.delete("/products/{product_id}")
-async def delete_product(product_id: str, current_admin: User = Depends(require_admin)):
+async def delete_product(product_id: str, current_admin: TokenUser = Depends(require_admin)):
     """Soft delete product (mark as inactive)"""
     result = await products_collection.update_one(
         {"id": product_id},
         {"$set": {
             "is_active": False,
-            "updated_at": datetime.now(timezone.utc).isoformat()
+            "updated_at": datetime.now(timezone.utc)
         }}
     )
     
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Product not found")
     
+    catalog.invalidate()
+    await bump_versions("products")
+    
     return {"success": True, "message": "Product deactivated"}
 
 # ============ ORDER MANAGEMENT ============
 
+def _order_status_sources(target: OrderStatus):
+    """Statuses an order may be in for an update to `target` (including `target` itself)"""
+    return [status.value for status, targets in ORDER_STATUS_TRANSITIONS.items() if status == target or target in targets]
+
+def _order_lines(order: dict):
+    return [(item["product_id"], item["quantity"]) for item in order["items"]]
+
+def _releases_stock(before: dict, after: dict):
+    """Cancelling returns the stock reserved at checkout (older orders never reserved any)"""
+    cancelled = OrderStatus.CANCELLED.value
+    return after["order_status"] == cancelled and before["order_status"] != cancelled and bool(before.get("stock_reserved"))
+
 @admin_router.get("/orders", response_model=List[Order])
-async def get_all_orders(current_admin: User = Depends(require_admin)):
-    """Get all orders"""
-    orders = await orders_collection.find({}, {"_id": 0}).sort("created_at", -1).to_list(1000)
+async def get_all_orders(request: Request, response: Response, page: PageParams = Depends(), current_admin: TokenUser = Depends(require_admin)):
+    """Get all orders (newest first, paginated; 304 if unchanged)"""
+    etag, unchanged = await list_etag(request, "orders")
+    if unchanged:
+        return unchanged
     
-    for order in orders:
-        order['created_at'] = datetime.fromisoformat(order['created_at'])
-        order['updated_at'] = datetime.fromisoformat(order['updated_at'])
+    orders = await paginate(orders_collection, {}, page, response)
     
-    return [Order(**order) for order in orders]
+    return with_etag(trusted_list_response(Order, orders, response.headers), etag)
 
 @admin_router.patch("/orders/{order_id}", response_model=Order)
-async def update_order(order_id: str, order_data: OrderUpdate, current_admin: User = Depends(require_admin)):
+async def update_order(order_id: str, order_data: OrderUpdate, current_admin: TokenUser = Depends(require_admin)):
     """Update order status/details"""
     update_data = {k: v.value if isinstance(v, Enum) else v for k, v in order_data.model_dump().items() if v is not None}
     
     if not update_data:
         raise HTTPException(status_code=400, detail="No fields to update")
     
-    update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
+    update_data["updated_at"] = datetime.now(timezone.utc)
     
-    result = await orders_collection.update_one(
-        {"id": order_id},
-        {"$set": update_data}
-    )
+    query = {"id": order_id}
+    if order_data.order_status:
+        # Only match while the current status may move to the requested one
+        query["order_status"] = {"$in": _order_status_sources(order_data.order_status)}
     
-    if result.modified_count == 0:
-        raise HTTPException(status_code=404, detail="Order not found")
+    before = await orders_collection.find_one_and_update(
+        query,
+        {"$set": update_data},
+        projection={"_id": 0},
+        return_document=ReturnDocument.BEFORE
+    )
     
-    # Return updated order
-    order = await orders_collection.find_one({"id": order_id}, {"_id": 0})
-    order['created_at'] = datetime.fromisoformat(order['created_at'])
-    order['updated_at'] = datetime.fromisoformat(order['updated_at'])
+    if not before:
+        current = await orders_collection.find_one({"id": order_id}, {"_id": 0, "order_status": 1})
+        if not current:
+            raise HTTPException(status_code=404, detail="Order not found")
+        raise HTTPException(
+            status_code=409,
+            detail=f"Cannot change order status from {current['order_status']} to {order_data.order_status.value}"
+        )
+    
+    order = {**before, **update_data}
+    await increment_counters(order_deltas(before, order))
+    await bump_versions("orders")
+    order_events.publish("order", order)
+    
+    if _releases_stock(before, order):
+        await release_stock(_order_lines(order))
+        await bump_versions("products")
+    
+    return trusted_response(Order, order)
+
+@admin_router.post("/orders/bulk-status")
+async def bulk_update_order_status(bulk_data: BulkOrderStatusUpdate, current_admin: TokenUser = Depends(require_admin)):
+    """Move many orders to one status; per-id outcome: updated/unchanged/invalid_transition/not_found/conflict"""
+    order_ids = _bulk_ids(bulk_data.order_ids)
+    target = bulk_data.order_status
+    now = datetime.now(timezone.utc)
+    
+    before = {
+        doc["id"]: doc
+        async for doc in orders_collection.find(
+            {"id": {"$in": order_ids}},
+            {"_id": 0, "id": 1, "user_id": 1, "order_number": 1, "order_status": 1, "payment_status": 1, "total_amount": 1, "items": 1, "stock_reserved": 1}
+        )
+    }
     
-    return Order(**order)
+    outcomes = {}
+    operations = []
+    for order_id in order_ids:
+        doc = before.get(order_id)
+        if not doc:
+            outcomes[order_id] = "not_found"
+        elif doc["order_status"] == target.value:
+            outcomes[order_id] = "unchanged"
+        elif target not in ORDER_STATUS_TRANSITIONS[OrderStatus(doc["order_status"])]:
+            outcomes[order_id] = "invalid_transition"
+        else:
+            outcomes[order_id] = "updated"
+            operations.append(UpdateOne(
+                {"id": order_id, "order_status": doc["order_status"]},
+                {"$set": {"order_status": target.value, "updated_at": now}}
+            ))
+    
+    planned = [order_id for order_id in order_ids if outcomes[order_id] == "updated"]
+    applied = await _bulk_apply(orders_collection, operations, planned, now)
+    
+    deltas = Counter()
+    released = []
+    for order_id in applied:
+        order = {**before[order_id], "order_status": target.value, "updated_at": now}
+        deltas.update(order_deltas(before[order_id], order))
+        order_events.publish("order", order)
+        if _releases_stock(before[order_id], order):
+            released.extend(_order_lines(order))
+    await increment_counters(deltas)
+    if applied:
+        await bump_versions("orders")
+    if released:
+        await release_stock(released)
+        await bump_versions("products")
+    
+    return _bulk_outcomes(order_ids, outcomes, applied)
 
 # ============ REQUEST ORDER MANAGEMENT ============
 
 @admin_router.get("/request-orders", response_model=List[RequestOrder])
-async def get_all_request_orders(current_admin: User = Depends(require_admin)):
-    """Get all request orders"""
-    requests = await request_orders_collection.find({}, {"_id": 0}).sort("created_at", -1).to_list(1000)
+async def get_all_request_orders(request: Request, response: Response, page: PageParams = Depends(), current_admin: TokenUser = Depends(require_admin)):
+    """Get all request orders (newest first, paginated; 304 if unchanged)"""
+    etag, unchanged = await list_etag(request, "request_orders")
+    if unchanged:
+        return unchanged
     
-    for req in requests:
-        req['created_at'] = datetime.fromisoformat(req['created_at'])
+    requests = await paginate(request_orders_collection, {}, page, response)
     
-    return [RequestOrder(**req) for req in requests]
+    return with_etag(trusted_list_response(RequestOrder, requests, response.headers), etag)
 
 @admin_router.patch("/request-orders/{request_id}", response_model=RequestOrder)
-async def update_request_order(request_id: str, request_data: RequestOrderUpdate, current_admin: User = Depends(require_admin)):
+async def update_request_order(request_id: str, request_data: RequestOrderUpdate, current_admin: TokenUser = Depends(require_admin)):
     """Update request order status"""
     update_data = {k: v.value if isinstance(v, Enum) else v for k, v in request_data.model_dump().items() if v is not None}
     
@@ -204,32 +505,51 @@ async def update_request_order(request_id: str, request_data: RequestOrderUpdate
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Request order not found")
     
+    await bump_versions("request_orders")
+    
     # Return updated request
     request_order = await request_orders_collection.find_one({"id": request_id}, {"_id": 0})
-    request_order['created_at'] = datetime.fromisoformat(request_order['created_at'])
+    order_events.publish("request_order", request_order)
     
-    return RequestOrder(**request_order)
+    return trusted_response(RequestOrder, request_order)
 
 # ============ REPORTS ============
 
-@admin_router.get("/reports/summary")
-async def get_summary_report(current_admin: User = Depends(require_admin)):
-    """Get summary statistics"""
-    total_users = await users_collection.count_documents({})
-    pending_users = await users_collection.count_documents({"status": UserStatus.PENDING.value})
-    total_orders = await orders_collection.count_documents({})
-    pending_orders = await orders_collection.count_documents({"payment_status": PaymentStatus.PENDING.value})
-    completed_orders = await orders_collection.count_documents({"order_status": OrderStatus.DELIVERED.value})
-    
-    # Calculate revenue
-    orders = await orders_collection.find({"payment_status": PaymentStatus.RECEIVED.value}, {"_id": 0}).to_list(10000)
-    total_revenue = sum(order.get("total_amount", 0) for order in orders)
-    
+@admin_router.get("/cache-stats")
+async def get_cache_stats(current_admin: TokenUser = Depends(require_admin)):
+    """Get in-process cache hit/miss counters"""
+    return {"users": user_cache.stats(), "catalog": catalog.stats()}
+
+@admin_router.get("/metrics")
+async def get_metrics(current_admin: TokenUser = Depends(require_admin)):
+    """Get per-route latency/status, per-collection Mongo command, event stream and SMS queue metrics for this worker"""
     return {
-        "total_users": total_users,
-        "pending_users": pending_users,
-        "total_orders": total_orders,
-        "pending_orders": pending_orders,
-        "completed_orders": completed_orders,
-        "total_revenue": total_revenue
+        **metrics.snapshot(),
+        "order_events": order_events.stats(),
+        "sms": otp_service.sms_queue.stats() if otp_service.sms_queue else None
     }
+
+@admin_router.get("/slow-queries")
+async def get_slow_queries(limit: int = 50, current_admin: TokenUser = Depends(require_admin)):
+    """Get slow query shapes seen by this worker (SLOW_QUERY_PROFILER_ENABLED), most total time first"""
+    return slow_query_profiler.summary(limit)
+
+async def require_metrics_access(authorization: Optional[str] = Header(None)):
+    if METRICS_SCRAPE_TOKEN and authorization and hmac.compare_digest(authorization, f"Bearer {METRICS_SCRAPE_TOKEN}"):
+        return
+    await require_admin(await get_token_user(authorization))
+
+@admin_router.get("/metrics/prometheus")
+async def get_prometheus_metrics(_: None = Depends(require_metrics_access)):
+    """Same metrics in the Prometheus text format (admin token or METRICS_SCRAPE_TOKEN)"""
+    return Response(content=metrics.prometheus(), media_type="text/plain; version=0.0.4")
+
+@admin_router.get("/reports/summary")
+async def get_summary_report(current_admin: TokenUser = Depends(require_admin)):
+    """Get summary statistics"""
+    return await get_summary()
+
+@admin_router.post("/reports/summary/rebuild")
+async def rebuild_summary_report(current_admin: TokenUser = Depends(require_admin)):
+    """Recompute stored summary counters from the collections"""
+    return await rebuild_summary()
@@ -0,0 +1,153 @@
+from fastapi import APIRouter, HTTPException, Depends
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from datetime import datetime, timezone
+
+from models import *
+from database import *
+from auth import get_token_user, require_approved
+from catalog import catalog, price_for_role
+from serialization import trusted_response
+
+cart_router = APIRouter(prefix="/api/cart", tags=["cart"])
+
+MIN_ORDER_BAGS = 100
+
+# Every mutation is a single atomic update on the cart document that returns the new
+# cart, so concurrent tabs/devices never overwrite each other's lines.
+
+def _check_quantity(quantity: int):
+    if quantity < MIN_ORDER_BAGS:
+        raise HTTPException(status_code=400, detail=f"Minimum order quantity is {MIN_ORDER_BAGS} bags")
+
+async def _price(product_id: str, role: UserRole):
+    """Price per bag for the user's tier, from the cached catalog"""
+    product = await catalog.get(product_id)
+    if not product or not product.is_active:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return price_for_role(product, role)
+
+def _line_update(user_id: str, product_id: str, update: dict):
+    """Apply `update` to the product's line ("items.$") if it is in the cart"""
+    return carts_collection.find_one_and_update(
+        {"user_id": user_id, "items.product_id": product_id},
+        update,
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+
+def _cart_response(user_id: str, cart):
+    return trusted_response(Cart, cart or {"user_id": user_id, "items": []})
+
+@cart_router.get("", response_model=Cart)
+async def get_cart(current_user: TokenUser = Depends(get_token_user)):
+    """Get the user's cart (empty if none yet)"""
+    cart = await carts_collection.find_one({"user_id": current_user.id}, {"_id": 0})
+    
+    return _cart_response(current_user.id, cart)
+
+@cart_router.post("/add", response_model=Cart)
+async def add_to_cart(item: CartItemAdd, current_user: TokenUser = Depends(require_approved)):
+    """Add bags of a product; merged into the product's line if it is already in the cart"""
+    _check_quantity(item.quantity)
+    price = await _price(item.product_id, current_user.role)
+    now = datetime.now(timezone.utc)
+    
+    # Usually one round trip: bump an existing line, else push a new one (creating the cart).
+    # The $ne guard stops a concurrent add of the same product from creating a second line;
+    # it then fails the upsert on the unique user_id index and the $inc is retried.
+    for _ in range(2):
+        cart = await _line_update(current_user.id, item.product_id, {
+            "$inc": {"items.$.quantity": item.quantity},
+            "$set": {"items.$.price_per_bag": price, "updated_at": now}
+        })
+        if cart:
+            return _cart_response(current_user.id, cart)
+    
+        try:
+            cart = await carts_collection.find_one_and_update(
+                {"user_id": current_user.id, "items.product_id": {"$ne": item.product_id}},
+                {
+                    "$push": {"items": {"product_id": item.product_id, "quantity": item.quantity, "price_per_bag": price}},
+                    "$set": {"updated_at": now}
+                },
+                projection={"_id": 0},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            return _cart_response(current_user.id, cart)
+        except DuplicateKeyError:
+            continue
+    
+    raise HTTPException(status_code=409, detail="Cart changed concurrently, please retry")
+
+@cart_router.put("/items/{product_id}", response_model=Cart)
+async def update_cart_item(product_id: str, item: CartItemUpdate, current_user: TokenUser = Depends(require_approved)):
+    """Set the quantity of a cart line"""
+    _check_quantity(item.quantity)
+    price = await _price(product_id, current_user.role)
+    
+    cart = await _line_update(current_user.id, product_id, {
+        "$set": {
+            "items.$.quantity": item.quantity,
+            "items.$.price_per_bag": price,
+            "updated_at": datetime.now(timezone.utc)
+        }
+    })
+    
+    if not cart:
+        raise HTTPException(status_code=404, detail="Item not in cart")
+    
+    return _cart_response(current_user.id, cart)
+
+@cart_router.put("", response_model=Cart)
+async def set_cart(cart_data: CartSet, current_user: TokenUser = Depends(require_approved)):
+    """Replace all cart lines at once (repeated products are summed)"""
+    totals = {}
+    for item in cart_data.items:
+        totals[item.product_id] = totals.get(item.product_id, 0) + item.quantity
+    for quantity in totals.values():
+        _check_quantity(quantity)
+    
+    products = await catalog.get_many(list(totals))
+    missing = [product_id for product_id in totals if product_id not in products or not products[product_id].is_active]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Product not found: {', '.join(missing)}")
+    
+    items = [
+        {"product_id": product_id, "quantity": quantity, "price_per_bag": price_for_role(products[product_id], current_user.role)}
+        for product_id, quantity in totals.items()
+    ]
+    cart = await carts_collection.find_one_and_update(
+        {"user_id": current_user.id},
+        {"$set": {"items": items, "updated_at": datetime.now(timezone.utc)}},
+        projection={"_id": 0},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    
+    return _cart_response(current_user.id, cart)
+
+@cart_router.delete("/remove/{product_id}", response_model=Cart)
+async def remove_from_cart(product_id: str, current_user: TokenUser = Depends(get_token_user)):
+    """Remove a product's line from the cart"""
+    cart = await carts_collection.find_one_and_update(
+        {"user_id": current_user.id},
+        {"$pull": {"items": {"product_id": product_id}}, "$set": {"updated_at": datetime.now(timezone.utc)}},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    
+    return _cart_response(current_user.id, cart)
+
+@cart_router.delete("/clear", response_model=Cart)
+async def clear_cart(current_user: TokenUser = Depends(get_token_user)):
+    """Remove every line from the cart"""
+    cart = await carts_collection.find_one_and_update(
+        {"user_id": current_user.id},
+        {"$set": {"items": [], "updated_at": datetime.now(timezone.utc)}},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    
+    return _cart_response(current_user.id, cart)
@@ -0,0 +1,125 @@
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from datetime import datetime, timezone
+import csv
+import io
+import json
+import zlib
+
+from models import *
+from database import *
+from auth import require_admin
+from serialization import orjson
+
+export_router = APIRouter(prefix="/api/admin/export", tags=["admin"])
+
+# ============ STREAMING EXPORTS ============
+
+# Export name -> (collection, status field, exported columns)
+EXPORTS = {
+    "orders": (orders_collection, "order_status", [
+        "id", "order_number", "user_id", "order_status", "payment_status", "payment_method",
+        "subtotal", "gst_amount", "surcharge_amount", "total_amount", "delivery_address_id",
+        "driver_name", "driver_mobile", "vehicle_number", "items", "created_at", "updated_at",
+    ]),
+    "users": (users_collection, "status", [
+        "id", "phone", "role", "status", "name", "email", "business_name", "brand_shop_name",
+        "gst_number", "gst_registered_name", "is_active", "created_at", "updated_at",
+    ]),
+    "request-orders": (request_orders_collection, "status", [
+        "id", "user_id", "cement_brand", "quantity", "delivery_location", "phone",
+        "preferred_delivery_date", "status", "admin_notes", "created_at",
+    ]),
+}
+
+MAX_BATCH_SIZE = 10000
+
+def _plain(value):
+    """JSON/CSV-friendly form of a stored value"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+def _ndjson_line(doc: dict) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(doc, default=str) + b"\n"
+    return (json.dumps(doc, default=_plain) + "\n").encode()
+
+async def _ndjson_rows(cursor):
+    async for doc in cursor:
+        yield _ndjson_line(doc)
+
+async def _csv_rows(cursor, columns):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    async for doc in cursor:
+        row = []
+        for column in columns:
+            value = doc.get(column)
+            if isinstance(value, (list, dict)):
+                value = _ndjson_line(value).decode().rstrip("\n")
+            row.append("" if value is None else _plain(value))
+        writer.writerow(row)
+        # Flush once the buffer holds a few KB so chunks are neither tiny nor large
+        if buffer.tell() >= 16384:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+async def _gzip(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+@export_router.get("/{export_name}")
+async def export_collection(
+    export_name: str,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    status: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    batch_size: int = Query(1000, ge=1, le=MAX_BATCH_SIZE),
+    gzip: bool = False,
+    current_admin: TokenUser = Depends(require_admin)
+):
+    """Stream a full export (oldest first) straight from the database cursor"""
+    if export_name not in EXPORTS:
+        raise HTTPException(status_code=404, detail="Unknown export")
+    
+    collection, status_field, columns = EXPORTS[export_name]
+    
+    query = {}
+    if status:
+        query[status_field] = status
+    if created_from or created_to:
+        query["created_at"] = {}
+        if created_from:
+            query["created_at"]["$gte"] = created_from
+        if created_to:
+            query["created_at"]["$lt"] = created_to
+    
+    # Only the declared columns, in either format - never internal fields like token_version
+    projection = {"_id": 0, **{column: 1 for column in columns}}
+    cursor = collection.find(query, projection).sort([("created_at", 1), ("id", 1)]).batch_size(batch_size)
+    
+    if format == "csv":
+        body = _csv_rows(cursor, columns)
+        media_type = "text/csv"
+    else:
+        body = _ndjson_rows(cursor)
+        media_type = "application/x-ndjson"
+    
+    filename = f"{export_name}-{datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')}.{format}"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if gzip:
+        body = _gzip(body)
+        headers["Content-Disposition"] = f'attachment; filename="{filename}.gz"'
+        media_type = "application/gzip"
+    
+    return StreamingResponse(body, media_type=media_type, headers=headers)
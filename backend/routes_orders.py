@@ -1,42 +1,62 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
+from fastapi import APIRouter, HTTPException, Depends, Header, Request, Response
+from fastapi.responses import StreamingResponse
+from pymongo import ReturnDocument
+from typing import List, Optional
+import json
+import asyncio
 from datetime import datetime, timezone
 import uuid
 
 from models import *
 from database import *
-from auth import get_current_user, require_approved
+from auth import create_stream_token, get_stream_user, get_token_user, require_approved
+from catalog import catalog
+from etags import bump_versions, list_etag, with_etag
+from events import order_events
+from idempotency import idempotency
+from inventory import InsufficientStock, reserve_stock, release_stock
+from pagination import PageParams, paginate
+from serialization import FastJSONResponse, trusted_response, trusted_list_response
+from stats import increment_counters, order_deltas
 
 orders_router = APIRouter(prefix="/api/orders", tags=["orders"])
 
 @orders_router.post("/create", response_model=Order)
-async def create_order(order_data: OrderCreate, current_user: User = Depends(require_approved)):
-    """Create order from cart"""
-    
-    # Get cart
-    cart = await carts_collection.find_one({"user_id": current_user.id})
+async def create_order(order_data: OrderCreate, current_user: TokenUser = Depends(require_approved), idempotency_key: Optional[str] = Header(None)):
+    """Create order from cart (a retry with the same Idempotency-Key gets the first response)"""
+    return await idempotency.run(
+        idempotency_key, current_user.id, "orders.create", order_data.model_dump_json(),
+        lambda: _create_order(order_data, current_user)
+    )
+
+async def _create_order(order_data: OrderCreate, current_user: TokenUser):
+    # Cart and address are independent reads - fetch them concurrently
+    cart, address = await asyncio.gather(
+        carts_collection.find_one({"user_id": current_user.id}),
+        addresses_collection.find_one({"id": order_data.delivery_address_id, "user_id": current_user.id})
+    )
     if not cart or not cart.get("items"):
         raise HTTPException(status_code=400, detail="Cart is empty")
     
-    # Verify address
-    address = await addresses_collection.find_one({"id": order_data.delivery_address_id, "user_id": current_user.id})
     if not address:
         raise HTTPException(status_code=404, detail="Delivery address not found")
     
+    # Get product details for all cart items at once
+    products = await catalog.get_many([item["product_id"] for item in cart["items"]])
+    
     # Build order items
     order_items = []
     subtotal = 0
     
     for cart_item in cart["items"]:
-        # Get product details
-        product = await products_collection.find_one({"id": cart_item["product_id"]}, {"_id": 0})
+        product = products.get(cart_item["product_id"])
         if not product:
             continue
         
         item_total = cart_item["quantity"] * cart_item["price_per_bag"]
         order_items.append(OrderItem(
             product_id=cart_item["product_id"],
-            product_name=product["name"],
+            product_name=product.name,
             quantity=cart_item["quantity"],
             price_per_bag=cart_item["price_per_bag"],
             total_price=item_total
@@ -66,66 +86,92 @@ async def create_order(order_data: OrderCreate, current_user: User = Depends(req
     )
     
     order_dict = order.model_dump()
-    order_dict['created_at'] = order_dict['created_at'].isoformat()
-    order_dict['updated_at'] = order_dict['updated_at'].isoformat()
     
-    await orders_collection.insert_one(order_dict)
+    # Take stock for every line atomically; put it back if the order cannot be stored
+    stock_lines = [(item.product_id, item.quantity) for item in order_items]
+    try:
+        await reserve_stock(stock_lines)
+    except InsufficientStock as e:
+        names = ", ".join(products[product_id].name for product_id in e.product_ids)
+        raise HTTPException(status_code=409, detail=f"Insufficient stock for {names}")
+    
+    order_dict["stock_reserved"] = True
+    try:
+        await orders_collection.insert_one(order_dict)
+    except Exception:
+        await release_stock(stock_lines)
+        raise
+    await increment_counters(order_deltas(None, order_dict))
+    await bump_versions("orders", "products")
     
     # Clear cart
     await carts_collection.update_one(
         {"user_id": current_user.id},
-        {"$set": {"items": [], "updated_at": datetime.now(timezone.utc).isoformat()}}
+        {"$set": {"items": [], "updated_at": datetime.now(timezone.utc)}}
     )
     
-    return order
+    return trusted_response(Order, order_dict)
 
 @orders_router.get("/my-orders", response_model=List[Order])
-async def get_my_orders(current_user: User = Depends(get_current_user)):
-    """Get user's orders"""
-    orders = await orders_collection.find({"user_id": current_user.id}, {"_id": 0}).sort("created_at", -1).to_list(1000)
+async def get_my_orders(request: Request, response: Response, page: PageParams = Depends(), current_user: TokenUser = Depends(get_token_user)):
+    """Get user's orders (newest first, paginated; 304 if unchanged)"""
+    etag, unchanged = await list_etag(request, "orders", current_user.id)
+    if unchanged:
+        return unchanged
     
-    for order in orders:
-        order['created_at'] = datetime.fromisoformat(order['created_at'])
-        order['updated_at'] = datetime.fromisoformat(order['updated_at'])
+    orders = await paginate(orders_collection, {"user_id": current_user.id}, page, response)
     
-    return [Order(**order) for order in orders]
+    return with_etag(trusted_list_response(Order, orders, response.headers), etag)
 
-@orders_router.get("/{order_id}", response_model=Order)
-async def get_order(order_id: str, current_user: User = Depends(get_current_user)):
-    """Get order by ID"""
-    order = await orders_collection.find_one({"id": order_id, "user_id": current_user.id}, {"_id": 0})
-    
-    if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
-    
-    order['created_at'] = datetime.fromisoformat(order['created_at'])
-    order['updated_at'] = datetime.fromisoformat(order['updated_at'])
-    
-    return Order(**order)
+@orders_router.post("/events/token")
+async def order_event_stream_token(current_user: TokenUser = Depends(get_token_user)):
+    """Short-lived token for opening /events (EventSource can only authenticate through the URL)"""
+    return {"token": create_stream_token(current_user)}
+
+@orders_router.get("/events")
+async def order_event_stream(current_user: TokenUser = Depends(get_stream_user)):
+    """Server-Sent Events: the user's order and request-order status changes as they happen"""
+    return StreamingResponse(
+        order_events.stream(current_user.id),
+        media_type="text/event-stream",
+        # no-transform / X-Accel-Buffering keep proxies from buffering the stream
+        headers={"Cache-Control": "no-cache, no-transform", "X-Accel-Buffering": "no"}
+    )
 
 @orders_router.post("/payment-confirmation/{order_id}")
-async def confirm_payment(order_id: str, confirmation_data: dict, current_user: User = Depends(get_current_user)):
-    """Confirm payment received (for bank transfer/manual verification)"""
-    order = await orders_collection.find_one({"id": order_id, "user_id": current_user.id})
+async def confirm_payment(order_id: str, confirmation_data: dict, current_user: TokenUser = Depends(get_token_user), idempotency_key: Optional[str] = Header(None)):
+    """Confirm payment received (for bank transfer/manual verification; Idempotency-Key aware)"""
+    return await idempotency.run(
+        idempotency_key, current_user.id, f"orders.payment-confirmation:{order_id}", json.dumps(confirmation_data, sort_keys=True, default=str),
+        lambda: _confirm_payment(order_id, current_user)
+    )
+
+async def _confirm_payment(order_id: str, current_user: TokenUser):
+    # Update payment status to pending (admin will verify)
+    update_data = {
+        "payment_status": PaymentStatus.PENDING.value,
+        "updated_at": datetime.now(timezone.utc)
+    }
+    order = await orders_collection.find_one_and_update(
+        {"id": order_id, "user_id": current_user.id},
+        {"$set": update_data},
+        projection={"_id": 0, "id": 1, "user_id": 1, "order_number": 1, "payment_status": 1, "order_status": 1, "total_amount": 1},
+        return_document=ReturnDocument.BEFORE
+    )
     
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
-    # Update payment status to pending (admin will verify)
-    await orders_collection.update_one(
-        {"id": order_id},
-        {"$set": {
-            "payment_status": PaymentStatus.PENDING.value,
-            "updated_at": datetime.now(timezone.utc).isoformat()
-        }}
-    )
+    await increment_counters(order_deltas(order, {**order, **update_data}))
+    await bump_versions("orders")
+    order_events.publish("order", {**order, **update_data})
     
-    return {"success": True, "message": "Payment confirmation submitted. Admin will verify."}
+    return FastJSONResponse({"success": True, "message": "Payment confirmation submitted. Admin will verify."})
 
 # ============ REQUEST ORDER ROUTES ============
 
 @orders_router.post("/request-order", response_model=RequestOrder)
-async def create_request_order(request_data: RequestOrderCreate, current_user: User = Depends(require_approved)):
+async def create_request_order(request_data: RequestOrderCreate, current_user: TokenUser = Depends(require_approved)):
     """Create a request order for large/custom quantities"""
     
     request_order = RequestOrder(
@@ -134,21 +180,30 @@ async def create_request_order(request_data: RequestOrderCreate, current_user: U
     )
     
     request_dict = request_order.model_dump()
-    request_dict['created_at'] = request_dict['created_at'].isoformat()
     
     await request_orders_collection.insert_one(request_dict)
+    await bump_versions("request_orders")
     
     return request_order
 
 @orders_router.get("/request-orders", response_model=List[RequestOrder])
-async def get_my_request_orders(current_user: User = Depends(get_current_user)):
-    """Get user's request orders"""
-    requests = await request_orders_collection.find(
-        {"user_id": current_user.id}, 
-        {"_id": 0}
-    ).sort("created_at", -1).to_list(1000)
+async def get_my_request_orders(request: Request, response: Response, page: PageParams = Depends(), current_user: TokenUser = Depends(get_token_user)):
+    """Get user's request orders (newest first, paginated; 304 if unchanged)"""
+    etag, unchanged = await list_etag(request, "request_orders", current_user.id)
+    if unchanged:
+        return unchanged
+    
+    requests = await paginate(request_orders_collection, {"user_id": current_user.id}, page, response)
     
-    for req in requests:
-        req['created_at'] = datetime.fromisoformat(req['created_at'])
+    return with_etag(trusted_list_response(RequestOrder, requests, response.headers), etag)
+
+# Declared last so the catch-all path does not shadow /request-orders
+@orders_router.get("/{order_id}", response_model=Order)
+async def get_order(order_id: str, current_user: TokenUser = Depends(get_token_user)):
+    """Get order by ID"""
+    order = await orders_collection.find_one({"id": order_id, "user_id": current_user.id}, {"_id": 0})
+    
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
     
-    return [RequestOrder(**req) for req in requests]
+    return trusted_response(Order, order)
@@ -1,6 +1,24 @@
+"""Seed the database: admin user and sample products, plus optional synthetic data.
+
+With no arguments only the admin user and the three sample products are
+created. The generator options add production-scale synthetic users,
+addresses, carts, orders and request orders with realistic distributions, so
+index, pagination and reporting performance can be measured locally:
+
+    python seed_db.py --users 1000000 --orders 3000000 --request-orders 200000 --drop
+
+Documents are built deterministically from --seed (rerunning with the same
+seed produces the same ids and values, whatever --writers is) and written with
+batched insert_many calls from parallel writers. Indexes are created by the API
+on startup; building them after a large load is faster than inserting into them.
+"""
+import argparse
 import asyncio
+import random
+import time
+import uuid
 from motor.motor_asyncio import AsyncIOMotorClient
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 import os
 from dotenv import load_dotenv
 from pathlib import Path
@@ -26,8 +44,8 @@ async def seed_data():
             "email": "admin@cemention.com",
             "status": "APPROVED",
             "is_active": True,
-            "created_at": datetime.now(timezone.utc).isoformat(),
-            "updated_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc),
+            "updated_at": datetime.now(timezone.utc)
         }
         await db.users.insert_one(admin_user)
         print("✓ Admin user created (Phone: +911234567890)")
@@ -48,8 +66,8 @@ async def seed_data():
                 "stock_available": 10000,
                 "image_url": "https://images.unsplash.com/photo-1625308216182-218ff63d47bb?w=400",
                 "is_active": True,
-                "created_at": datetime.now(timezone.utc).isoformat(),
-                "updated_at": datetime.now(timezone.utc).isoformat()
+                "created_at": datetime.now(timezone.utc),
+                "updated_at": datetime.now(timezone.utc)
             },
             {
                 "id": "prod-002",
@@ -63,8 +81,8 @@ async def seed_data():
                 "stock_available": 8000,
                 "image_url": "https://images.unsplash.com/photo-1625308216182-218ff63d47bb?w=400",
                 "is_active": True,
-                "created_at": datetime.now(timezone.utc).isoformat(),
-                "updated_at": datetime.now(timezone.utc).isoformat()
+                "created_at": datetime.now(timezone.utc),
+                "updated_at": datetime.now(timezone.utc)
             },
             {
                 "id": "prod-003",
@@ -78,15 +96,257 @@ async def seed_data():
                 "stock_available": 12000,
                 "image_url": "https://images.unsplash.com/photo-1625308216182-218ff63d47bb?w=400",
                 "is_active": True,
-                "created_at": datetime.now(timezone.utc).isoformat(),
-                "updated_at": datetime.now(timezone.utc).isoformat()
+                "created_at": datetime.now(timezone.utc),
+                "updated_at": datetime.now(timezone.utc)
             }
         ]
         await db.products.insert_many(products)
         print(f"✓ {len(products)} products created")
     
     print("Database seeding completed!")
-    client.close()
+
+# ============ SYNTHETIC DATA ============
+
+SEED_PRODUCTS = [
+    ("prod-001", "UltraTech PPC Cement", {"DEALER": 300, "RETAILER": 303, "CUSTOMER": 305}),
+    ("prod-002", "ACC Gold Cement", {"DEALER": 305, "RETAILER": 308, "CUSTOMER": 310}),
+    ("prod-003", "Ambuja OPC Cement", {"DEALER": 298, "RETAILER": 301, "CUSTOMER": 303}),
+]
+SYNTHETIC_COLLECTIONS = ["users", "addresses", "carts", "orders", "request_orders"]
+
+ROLE_MIX = (["DEALER", "RETAILER", "CUSTOMER"], [30, 40, 30])
+BUSINESS_STATUS_MIX = (["APPROVED", "PENDING", "REJECTED"], [85, 10, 5])
+QUANTITY_MIX = ([100, 200, 300, 500, 1000, 2000], [30, 25, 15, 15, 10, 5])
+PAYMENT_METHOD_MIX = (["UPI", "CARD", "NETBANKING", "BANK_TRANSFER", "COD"], [35, 15, 10, 25, 15])
+# Orders younger than a week are still moving through the pipeline
+OPEN_ORDER_STATUS_MIX = (["PENDING", "PAYMENT_RECEIVED", "ASSIGNED", "OUT_FOR_DELIVERY", "DELIVERED", "CANCELLED"], [30, 20, 15, 10, 20, 5])
+CLOSED_ORDER_STATUS_MIX = (["DELIVERED", "CANCELLED"], [92, 8])
+REQUEST_STATUS_MIX = (["PENDING", "APPROVED", "REJECTED"], [20, 65, 15])
+CITIES = [("Pune", "Maharashtra", "411"), ("Mumbai", "Maharashtra", "400"), ("Ahmedabad", "Gujarat", "380"),
+          ("Bengaluru", "Karnataka", "560"), ("Jaipur", "Rajasthan", "302"), ("Lucknow", "Uttar Pradesh", "226")]
+BRANDS = ["UltraTech", "ACC", "Ambuja", "Shree", "Dalmia", "JK Lakshmi"]
+
+class SyntheticData:
+    """Deterministic document factory - the n-th document only depends on the seed and n"""
+    
+    def __init__(self, seed: int, users: int, days: int, cart_fraction: float):
+        self.seed = seed
+        self.users = users
+        self.days = days
+        self.cart_fraction = cart_fraction
+        self.namespace = uuid.uuid5(uuid.NAMESPACE_OID, f"cemention-seed-{seed}")
+        self.now = datetime.now(timezone.utc).replace(microsecond=0)
+    
+    def rng(self, kind: str, n: int):
+        return random.Random(f"{self.seed}-{kind}-{n}")
+    
+    def id(self, kind: str, n: int):
+        return str(uuid.uuid5(self.namespace, f"{kind}-{n}"))
+    
+    def user_profile(self, n: int):
+        """Role, status and signup age (days) of user n"""
+        rng = self.rng("user", n)
+        role = rng.choices(*ROLE_MIX)[0]
+        status = rng.choices(*BUSINESS_STATUS_MIX)[0] if role != "CUSTOMER" else "APPROVED"
+        # Sign-ups grow over time: more recent users than old ones
+        age_days = self.days * (1 - rng.random() ** 0.5)
+        return rng, role, status, age_days
+    
+    def user(self, n: int):
+        rng, role, status, age_days = self.user_profile(n)
+        created_at = self.now - timedelta(days=age_days)
+        doc = {
+            "id": self.id("user", n),
+            "phone": f"+91{6000000000 + n}",
+            "role": role,
+            "name": f"User {n}",
+            "email": f"user{n}@example.com" if rng.random() < 0.6 else None,
+            "status": status,
+            "is_active": True,
+            "created_at": created_at,
+            "updated_at": created_at,
+        }
+        if role != "CUSTOMER":
+            doc.update({
+                "business_name": f"{rng.choice(BRANDS)} Traders {n}",
+                "brand_shop_name": f"Shop {n}",
+                "gst_number": f"{rng.randint(10, 37)}ABCDE{n % 10000:04d}F1Z{rng.randint(0, 9)}",
+                "gst_registered_name": f"Traders {n} Pvt Ltd",
+            })
+        return doc
+    
+    def addresses(self, n: int):
+        rng = self.rng("address", n)
+        docs = []
+        for k in range(1 if rng.random() < 0.7 else 2):
+            city, state, pin_prefix = rng.choice(CITIES)
+            docs.append({
+                "id": self.id("address", n * 2 + k),
+                "user_id": self.id("user", n),
+                "address_line1": f"{rng.randint(1, 999)} Industrial Area",
+                "address_line2": None,
+                "city": city,
+                "state": state,
+                "pincode": f"{pin_prefix}{rng.randint(0, 999):03d}",
+                "is_default": k == 0,
+                "created_at": self.now - timedelta(days=self.user_profile(n)[3]),
+            })
+        return docs
+    
+    def cart(self, n: int):
+        rng = self.rng("cart", n)
+        if rng.random() >= self.cart_fraction:
+            return None
+        role = self.user_profile(n)[1]
+        items = []
+        for product_id, _, prices in rng.sample(SEED_PRODUCTS, rng.randint(1, len(SEED_PRODUCTS))):
+            items.append({"product_id": product_id, "quantity": rng.choices(*QUANTITY_MIX)[0], "price_per_bag": prices[role]})
+        return {"user_id": self.id("user", n), "items": items, "updated_at": self.now - timedelta(hours=rng.random() * 72)}
+    
+    def order_user(self, rng):
+        """Skewed towards low user numbers - a minority of customers places most orders"""
+        return int(self.users * rng.random() ** 3)
+    
+    def order(self, n: int):
+        rng = self.rng("order", n)
+        user_n = self.order_user(rng)
+        _, role, _, user_age_days = self.user_profile(user_n)
+        age_days = user_age_days * (1 - rng.random() ** 0.5)
+        created_at = self.now - timedelta(days=age_days)
+        
+        items = []
+        for product_id, name, prices in rng.sample(SEED_PRODUCTS, rng.choices([1, 2, 3], [70, 22, 8])[0]):
+            quantity = rng.choices(*QUANTITY_MIX)[0]
+            items.append({"product_id": product_id, "product_name": name, "quantity": quantity,
+                          "price_per_bag": prices[role], "total_price": quantity * prices[role]})
+        subtotal = sum(item["total_price"] for item in items)
+        payment_method = rng.choices(*PAYMENT_METHOD_MIX)[0]
+        gst_amount = int(subtotal * 0.18)
+        surcharge_amount = int(subtotal * 0.02) if payment_method == "CARD" else 0
+        
+        order_status = rng.choices(*(OPEN_ORDER_STATUS_MIX if age_days < 7 else CLOSED_ORDER_STATUS_MIX))[0]
+        if order_status in ("PENDING", "CANCELLED"):
+            payment_status = rng.choices(["PENDING", "FAILED"], [80, 20])[0]
+        else:
+            payment_status = "RECEIVED" if order_status != "PAYMENT_RECEIVED" or rng.random() < 0.9 else "PENDING"
+        
+        return {
+            "id": self.id("order", n),
+            "user_id": self.id("user", user_n),
+            "order_number": f"ORD{created_at.strftime('%Y%m%d%H%M%S')}{uuid.UUID(self.id('order', n)).hex[:6].upper()}",
+            "items": items,
+            "subtotal": subtotal,
+            "gst_amount": gst_amount,
+            "surcharge_amount": surcharge_amount,
+            "total_amount": subtotal + gst_amount + surcharge_amount,
+            "payment_method": payment_method,
+            "payment_status": payment_status,
+            "order_status": order_status,
+            "delivery_address_id": self.id("address", user_n * 2),
+            "driver_name": f"Driver {rng.randint(1, 500)}" if order_status in ("ASSIGNED", "OUT_FOR_DELIVERY", "DELIVERED") else None,
+            "driver_mobile": None,
+            "vehicle_number": None,
+            "invoice_url": None,
+            "created_at": created_at,
+            "updated_at": created_at + timedelta(hours=rng.random() * 48) if order_status != "PENDING" else created_at,
+        }
+    
+    def request_order(self, n: int):
+        rng = self.rng("request-order", n)
+        user_n = self.order_user(rng)
+        created_at = self.now - timedelta(days=self.user_profile(user_n)[3] * (1 - rng.random() ** 0.5))
+        city, _, _ = rng.choice(CITIES)
+        return {
+            "id": self.id("request-order", n),
+            "user_id": self.id("user", user_n),
+            "cement_brand": rng.choice(BRANDS),
+            "quantity": rng.choice([1000, 2000, 5000, 10000, 20000]),
+            "delivery_location": city,
+            "phone": f"+91{6000000000 + user_n}",
+            "preferred_delivery_date": (created_at + timedelta(days=rng.randint(3, 30))).date().isoformat(),
+            "status": rng.choices(*REQUEST_STATUS_MIX)[0],
+            "admin_notes": None,
+            "created_at": created_at,
+        }
+
+class Progress:
+    def __init__(self, name: str, total: int):
+        self.name = name
+        self.total = total
+        self.done = 0
+        self.started = time.perf_counter()
+    
+    def add(self, count: int):
+        self.done += count
+        elapsed = time.perf_counter() - self.started
+        print(f"\r  {self.name}: {self.done:,}/{self.total:,} ({self.done / self.total:.0%}) {self.done / elapsed:,.0f} docs/s", end="", flush=True)
+    
+    def finish(self):
+        print()
+
+async def write_batches(collection, name: str, count: int, build, batch_size: int, writers: int):
+    """Insert `build(n)` for n in range(count) in batches, with up to `writers` inserts in flight.
+    
+    `build` may return one document, a list of documents, or None.
+    """
+    if count <= 0:
+        return
+    progress = Progress(name, count)
+    semaphore = asyncio.Semaphore(writers)
+    
+    async def write(start: int):
+        async with semaphore:
+            docs = []
+            for n in range(start, min(start + batch_size, count)):
+                doc = build(n)
+                if isinstance(doc, list):
+                    docs.extend(doc)
+                elif doc is not None:
+                    docs.append(doc)
+            if docs:
+                await collection.insert_many(docs, ordered=False)
+            progress.add(min(start + batch_size, count) - start)
+    
+    await asyncio.gather(*(write(start) for start in range(0, count, batch_size)))
+    progress.finish()
+
+async def generate_data(args):
+    data = SyntheticData(args.seed, args.users, args.days, args.cart_fraction)
+    started = time.perf_counter()
+    print(f"Generating synthetic data (seed {args.seed}, {args.writers} writers, batches of {args.batch_size})...")
+    
+    if args.users:
+        await write_batches(db.users, "users", args.users, data.user, args.batch_size, args.writers)
+        await write_batches(db.addresses, "addresses (per user)", args.users, data.addresses, args.batch_size, args.writers)
+        await write_batches(db.carts, "carts (per user)", args.users, data.cart, args.batch_size, args.writers)
+        await write_batches(db.orders, "orders", args.orders, data.order, args.batch_size, args.writers)
+        await write_batches(db.request_orders, "request orders", args.request_orders, data.request_order, args.batch_size, args.writers)
+    
+    print(f"✓ Synthetic data generated in {time.perf_counter() - started:.1f}s")
+
+async def main(args):
+    try:
+        if args.drop:
+            for name in SYNTHETIC_COLLECTIONS:
+                await db[name].drop()
+            print(f"✓ Dropped {', '.join(SYNTHETIC_COLLECTIONS)}")
+        await seed_data()
+        if args.users:
+            await generate_data(args)
+        elif args.orders or args.request_orders:
+            print("Orders need users - pass --users as well")
+    finally:
+        client.close()
 
 if __name__ == "__main__":
-    asyncio.run(seed_data())
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=0, help="synthetic users (each gets 1-2 addresses)")
+    parser.add_argument("--orders", type=int, default=0)
+    parser.add_argument("--request-orders", type=int, default=0)
+    parser.add_argument("--cart-fraction", type=float, default=0.2, help="share of users with a non-empty cart")
+    parser.add_argument("--days", type=int, default=730, help="history spread of created_at")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--writers", type=int, default=4, help="concurrent insert_many calls")
+    parser.add_argument("--drop", action="store_true", help="drop users, addresses, carts, orders and request orders first")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,49 @@
+from functools import lru_cache
+from typing import List, Type
+
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel, TypeAdapter
+
+try:
+    import orjson
+except ImportError:  # fall back to the stdlib encoder
+    orjson = None
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson when it is installed"""
+
+    def render(self, content) -> bytes:
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+@lru_cache(maxsize=None)
+def list_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(List[model])
+
+
+def _json(content: bytes, headers=None) -> Response:
+    return Response(content=content, media_type="application/json", headers=headers)
+
+
+# Documents read back from our own collections were validated when they were
+# written, so the fast path builds models with model_construct (no validation)
+# and serializes them straight to JSON bytes, bypassing FastAPI's response_model
+# re-validation. Serialization warnings are silenced because constructed models
+# carry raw enum strings and nested dicts rather than enum/model instances.
+
+def trusted_response(model: Type[BaseModel], doc: dict) -> Response:
+    """JSON response for one DB-trusted document shaped as `model`"""
+    return _json(model.model_construct(**doc).model_dump_json(warnings=False).encode())
+
+
+def trusted_list_response(model: Type[BaseModel], docs: List[dict], headers=None) -> Response:
+    """JSON array response for DB-trusted documents shaped as `model`
+
+    Pass the injected Response's headers (e.g. X-Next-Cursor) as `headers`, since
+    FastAPI does not merge them into a Response returned by the endpoint.
+    """
+    items = [model.model_construct(**doc) for doc in docs]
+    return _json(list_adapter(model).dump_json(items, warnings=False), headers)
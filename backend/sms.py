@@ -0,0 +1,165 @@
+import asyncio
+import logging
+import os
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+
+logger = logging.getLogger("cemention.sms")
+
+# Provider selection: "twilio", "stub", or empty to use Twilio when credentials are set
+SMS_PROVIDER = os.environ.get("SMS_PROVIDER", "").lower()
+SMS_WORKERS = int(os.environ.get("SMS_WORKERS", "4"))
+SMS_QUEUE_SIZE = int(os.environ.get("SMS_QUEUE_SIZE", "1000"))
+SMS_MAX_ATTEMPTS = int(os.environ.get("SMS_MAX_ATTEMPTS", "3"))
+SMS_RETRY_BACKOFF_SECONDS = float(os.environ.get("SMS_RETRY_BACKOFF_SECONDS", "1"))
+SMS_STUB_LATENCY_MS = float(os.environ.get("SMS_STUB_LATENCY_MS", "0"))
+
+TWILIO_ACCOUNT_SID = os.environ.get("TWILIO_ACCOUNT_SID", "")
+TWILIO_AUTH_TOKEN = os.environ.get("TWILIO_AUTH_TOKEN", "")
+TWILIO_PHONE_NUMBER = os.environ.get("TWILIO_PHONE_NUMBER", "")
+
+
+class SMSProvider(ABC):
+    """Sends one SMS and returns the gateway's message id"""
+    name = "base"
+
+    @abstractmethod
+    async def send(self, to: str, body: str) -> str:
+        ...
+
+
+class TwilioSMSProvider(SMSProvider):
+    name = "twilio"
+
+    def __init__(self, account_sid: str, auth_token: str, from_number: str):
+        from twilio.rest import Client
+        self.client = Client(account_sid, auth_token)
+        self.from_number = from_number
+
+    async def send(self, to: str, body: str) -> str:
+        # The Twilio client is synchronous - keep its HTTP call off the event loop
+        message = await asyncio.to_thread(
+            self.client.messages.create, body=body, from_=self.from_number, to=to
+        )
+        return message.sid
+
+
+class StubSMSProvider(SMSProvider):
+    """Records messages in memory instead of sending them (tests / local load runs)"""
+    name = "stub"
+
+    def __init__(self, latency_ms: float = SMS_STUB_LATENCY_MS):
+        self.latency = latency_ms / 1000
+        self.sent = []
+
+    async def send(self, to: str, body: str) -> str:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.sent.append((to, body))
+        return f"stub-{len(self.sent)}"
+
+
+def build_provider():
+    """Provider configured through the environment, or None if SMS is not set up"""
+    if SMS_PROVIDER == "stub":
+        return StubSMSProvider()
+    if SMS_PROVIDER in ("", "twilio") and TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN:
+        return TwilioSMSProvider(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, TWILIO_PHONE_NUMBER)
+    return None
+
+
+class SMSDeliveryQueue:
+    """Bounded queue drained by a fixed pool of workers, with retries and backoff.
+
+    A job's optional async `on_status` callback receives the delivery fields
+    (delivery_status, delivery_attempts, sid / delivery_error) after every attempt.
+    """
+
+    def __init__(
+        self,
+        provider: SMSProvider,
+        workers: int = SMS_WORKERS,
+        max_pending: int = SMS_QUEUE_SIZE,
+        max_attempts: int = SMS_MAX_ATTEMPTS,
+        backoff: float = SMS_RETRY_BACKOFF_SECONDS,
+    ):
+        self.provider = provider
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self._queue = asyncio.Queue(maxsize=max_pending)
+        self._tasks = []
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+
+    def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, drain_timeout: float = 5.0):
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Stopping SMS workers with %d messages undelivered", self._queue.qsize())
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, to: str, body: str, on_status=None) -> bool:
+        """Queue a message; False if the queue is full"""
+        try:
+            self._queue.put_nowait((to, body, on_status))
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    def stats(self):
+        return {
+            "provider": self.provider.name,
+            "pending": self._queue.qsize(),
+            "sent": self.sent,
+            "failed": self.failed,
+            "retried": self.retried,
+        }
+
+    async def _worker(self):
+        while True:
+            to, body, on_status = await self._queue.get()
+            try:
+                await self._deliver(to, body, on_status)
+            except Exception:
+                logger.exception("SMS status callback failed")
+            finally:
+                self._queue.task_done()
+
+    async def _deliver(self, to, body, on_status):
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                sid = await self.provider.send(to, body)
+            except Exception as e:
+                if attempt < self.max_attempts:
+                    self.retried += 1
+                    if on_status:
+                        await on_status({"delivery_status": "RETRYING", "delivery_attempts": attempt, "delivery_error": str(e)})
+                    await asyncio.sleep(self.backoff * 2 ** (attempt - 1))
+                    continue
+                self.failed += 1
+                logger.warning("SMS to %s failed after %d attempts: %s", to, attempt, e)
+                if on_status:
+                    await on_status({"delivery_status": "FAILED", "delivery_attempts": attempt, "delivery_error": str(e)})
+                return
+
+            self.sent += 1
+            if on_status:
+                await on_status({
+                    "delivery_status": "SENT",
+                    "delivery_attempts": attempt,
+                    "sid": sid,
+                    "delivery_error": None,
+                    "sent_at": datetime.now(timezone.utc),
+                })
+            return
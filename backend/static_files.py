@@ -0,0 +1,150 @@
+import hashlib
+import logging
+import mimetypes
+import os
+import time
+from pathlib import Path
+
+from fastapi import Request
+from fastapi.responses import FileResponse, Response
+
+from compression import brotli, compress, is_compressible, preferred_encoding
+from etags import etag_matches, variant_etag
+
+logger = logging.getLogger("cemention.static")
+
+# Create-react-app puts content-hashed bundles under /static/, so they never change
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# index.html must be revalidated on every load to pick up a new build (cheap with ETags)
+INDEX_CACHE_CONTROL = "no-cache"
+DEFAULT_CACHE_CONTROL = "public, max-age=3600"
+
+PRECOMPRESS_MIN_BYTES = 1024
+INDEX_CHECK_SECONDS = 1.0
+MAX_CACHED_PATHS = 10000
+
+ENCODING_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+
+def _not_modified(etag: str, cache_control: str):
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"})
+
+
+class FrontendBuild:
+    """Serves the React build: index.html from memory, assets with precompressed variants.
+
+    Every response carries an ETag and answers If-None-Match with 304. File
+    metadata is cached per path and dropped whenever index.html changes, which
+    is what a new build deploy looks like.
+    """
+
+    def __init__(self, build_dir: Path):
+        self.build_dir = build_dir.resolve()
+        self._index = None
+        self._index_mtime = None
+        self._index_checked = 0.0
+        self._files = {}
+
+    @property
+    def index_file(self):
+        return self.build_dir / "index.html"
+
+    def exists(self):
+        return self.index_file.exists()
+
+    def precompress(self):
+        """Write .gz (and .br when available) next to compressible build files; returns files written"""
+        written = 0
+        for root, _, names in os.walk(self.build_dir):
+            for name in names:
+                path = Path(root) / name
+                if path.suffix in (".gz", ".br") or path.stat().st_size < PRECOMPRESS_MIN_BYTES:
+                    continue
+                if not is_compressible(mimetypes.guess_type(name)[0]):
+                    continue
+                body = None
+                for encoding, suffix in ENCODING_SUFFIXES.items():
+                    if encoding == "br" and brotli is None:
+                        continue
+                    target = path.with_name(name + suffix)
+                    if target.exists() and target.stat().st_mtime >= path.stat().st_mtime:
+                        continue
+                    body = body if body is not None else path.read_bytes()
+                    target.write_bytes(compress(body, encoding, quality=11 if encoding == "br" else 9))
+                    written += 1
+        self._files.clear()
+        return written
+
+    def _load_index(self):
+        now = time.monotonic()
+        if self._index is not None and now - self._index_checked < INDEX_CHECK_SECONDS:
+            return self._index
+        self._index_checked = now
+
+        mtime = self.index_file.stat().st_mtime_ns
+        if mtime != self._index_mtime:
+            body = self.index_file.read_bytes()
+            variants = {None: body, "gzip": compress(body, "gzip", quality=9)}
+            if brotli is not None:
+                variants["br"] = compress(body, "br", quality=11)
+            self._index = (variants, f'"{hashlib.sha1(body).hexdigest()[:20]}"')
+            self._index_mtime = mtime
+            # A new index.html means a new build - forget cached asset metadata
+            self._files.clear()
+        return self._index
+
+    def _file_entry(self, path: str):
+        if path in self._files:
+            return self._files[path]
+
+        entry = None
+        candidate = (self.build_dir / path).resolve()
+        if path and candidate.is_relative_to(self.build_dir) and candidate.is_file():
+            stat = candidate.stat()
+            variants = {None: (candidate, stat)}
+            for encoding, suffix in ENCODING_SUFFIXES.items():
+                variant = candidate.with_name(candidate.name + suffix)
+                if variant.is_file() and variant.stat().st_mtime >= stat.st_mtime:
+                    variants[encoding] = (variant, variant.stat())
+            entry = {
+                "variants": variants,
+                "etag": f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"',
+                "media_type": mimetypes.guess_type(candidate.name)[0] or "application/octet-stream",
+                "cache_control": IMMUTABLE_CACHE_CONTROL if path.startswith("static/") else DEFAULT_CACHE_CONTROL,
+            }
+
+        if len(self._files) >= MAX_CACHED_PATHS:
+            self._files.clear()
+        self._files[path] = entry
+        return entry
+
+    def index_response(self, request: Request):
+        variants, etag = self._load_index()
+        encoding = preferred_encoding(request.headers.get("accept-encoding"), tuple(e for e in ("br", "gzip") if e in variants))
+        etag = variant_etag(etag, encoding)
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return _not_modified(etag, INDEX_CACHE_CONTROL)
+
+        headers = {"ETag": etag, "Cache-Control": INDEX_CACHE_CONTROL, "Vary": "Accept-Encoding"}
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return Response(content=variants[encoding], media_type="text/html", headers=headers)
+
+    def response(self, path: str, request: Request):
+        """The build file at `path`, or index.html for client-side routes"""
+        self._load_index()
+        entry = self._file_entry(path)
+        if entry is None or path == "index.html":
+            return self.index_response(request)
+
+        variants = entry["variants"]
+        encoding = preferred_encoding(request.headers.get("accept-encoding"), tuple(e for e in ("br", "gzip") if e in variants))
+        etag = variant_etag(entry["etag"], encoding)
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return _not_modified(etag, entry["cache_control"])
+
+        file_path, stat = variants[encoding]
+        headers = {"ETag": etag, "Cache-Control": entry["cache_control"], "Vary": "Accept-Encoding"}
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return FileResponse(file_path, media_type=entry["media_type"], headers=headers, stat_result=stat)
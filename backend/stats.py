@@ -0,0 +1,126 @@
+import logging
+import os
+
+from models import OrderStatus, PaymentStatus, UserStatus
+from database import orders_collection, stats_collection
+
+# Optional precomputed dashboard counters. When enabled, every user/order status
+# change applies a $inc to a single summary document so the report is one read.
+STATS_COUNTERS_ENABLED = os.environ.get("STATS_COUNTERS_ENABLED", "false").lower() == "true"
+SUMMARY_ID = "summary"
+# A rebuild only stores its totals if no increment landed while it aggregated
+REBUILD_ATTEMPTS = 3
+
+logger = logging.getLogger("cemention.stats")
+
+SUMMARY_FIELDS = (
+    "total_users",
+    "pending_users",
+    "total_orders",
+    "pending_orders",
+    "completed_orders",
+    "total_revenue",
+)
+
+
+def _count(facet_rows):
+    return facet_rows[0]["n"] if facet_rows else 0
+
+
+async def compute_summary():
+    """Compute the summary server-side in a single aggregation over orders + users"""
+    pipeline = [
+        {"$project": {"_id": 0, "kind": "order", "payment_status": 1, "order_status": 1, "total_amount": 1}},
+        {"$unionWith": {
+            "coll": "users",
+            "pipeline": [{"$project": {"_id": 0, "kind": "user", "status": 1}}],
+        }},
+        {"$facet": {
+            "total_users": [{"$match": {"kind": "user"}}, {"$count": "n"}],
+            "pending_users": [
+                {"$match": {"kind": "user", "status": UserStatus.PENDING.value}},
+                {"$count": "n"},
+            ],
+            "total_orders": [{"$match": {"kind": "order"}}, {"$count": "n"}],
+            "pending_orders": [
+                {"$match": {"kind": "order", "payment_status": PaymentStatus.PENDING.value}},
+                {"$count": "n"},
+            ],
+            "completed_orders": [
+                {"$match": {"kind": "order", "order_status": OrderStatus.DELIVERED.value}},
+                {"$count": "n"},
+            ],
+            "total_revenue": [
+                {"$match": {"kind": "order", "payment_status": PaymentStatus.RECEIVED.value}},
+                {"$group": {"_id": None, "n": {"$sum": "$total_amount"}}},
+            ],
+        }},
+    ]
+    result = await orders_collection.aggregate(pipeline).to_list(1)
+    facets = result[0] if result else {}
+    return {field: _count(facets.get(field)) for field in SUMMARY_FIELDS}
+
+
+async def rebuild_summary():
+    """Recompute the counters from scratch and store them.
+
+    Every increment also bumps `generation`; the totals are only stored if it did not
+    move during the aggregation, so concurrent increments are never overwritten.
+    """
+    # Exists before the aggregation starts, so no later increment is dropped
+    await stats_collection.update_one({"_id": SUMMARY_ID}, {"$setOnInsert": {"generation": 0}}, upsert=True)
+    for _ in range(REBUILD_ATTEMPTS):
+        doc = await stats_collection.find_one({"_id": SUMMARY_ID}, {"_id": 0, "generation": 1})
+        summary = await compute_summary()
+        result = await stats_collection.update_one(
+            {"_id": SUMMARY_ID, "generation": doc.get("generation")},
+            {"$set": {**summary, "built": True}}
+        )
+        if result.matched_count:
+            return summary
+    logger.warning("Summary counters changed during %d rebuilds, not stored", REBUILD_ATTEMPTS)
+    return summary
+
+
+async def get_summary():
+    if not STATS_COUNTERS_ENABLED:
+        return await compute_summary()
+
+    doc = await stats_collection.find_one({"_id": SUMMARY_ID}, {"_id": 0})
+    if not doc or not doc.get("built"):
+        return await rebuild_summary()
+    return {field: doc.get(field, 0) for field in SUMMARY_FIELDS}
+
+
+async def increment_counters(deltas: dict):
+    """Apply counter deltas atomically (before the first build they are covered by its aggregation)"""
+    deltas = {k: v for k, v in deltas.items() if v}
+    if not STATS_COUNTERS_ENABLED or not deltas:
+        return
+    await stats_collection.update_one({"_id": SUMMARY_ID}, {"$inc": {**deltas, "generation": 1}})
+
+
+def user_deltas(before_status, after_status):
+    """Counter changes for a user moving between statuses (None = not existing)"""
+    pending = UserStatus.PENDING.value
+    return {
+        "total_users": (after_status is not None) - (before_status is not None),
+        "pending_users": (after_status == pending) - (before_status == pending),
+    }
+
+
+def order_deltas(before, after):
+    """Counter changes for an order document going from `before` to `after` (None = not existing)"""
+    def contribution(order):
+        if order is None:
+            return {"total_orders": 0, "pending_orders": 0, "completed_orders": 0, "total_revenue": 0}
+        paid = order.get("payment_status") == PaymentStatus.RECEIVED.value
+        return {
+            "total_orders": 1,
+            "pending_orders": int(order.get("payment_status") == PaymentStatus.PENDING.value),
+            "completed_orders": int(order.get("order_status") == OrderStatus.DELIVERED.value),
+            "total_revenue": order.get("total_amount", 0) if paid else 0,
+        }
+
+    old, new = contribution(before), contribution(after)
+    return {field: new[field] - old[field] for field in new}
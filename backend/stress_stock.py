@@ -0,0 +1,92 @@
+"""Concurrency stress test for inventory.reserve_stock against a local mongod.
+
+Seeds two products in a throwaway database (STRESS_DB_NAME, default
+cemention_stress), fires many concurrent two-line reservations at them, and
+checks that stock never goes negative, that exactly the successful
+reservations were deducted, and that failed multi-line reservations left no
+partial deductions behind. The database is dropped afterwards.
+
+Usage:
+    python stress_stock.py [--stock 10000] [--orders 500] [--quantity 100] [--concurrency 200]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+# Point the shared client at a scratch database before anything imports it
+os.environ["DB_NAME"] = os.environ.get("STRESS_DB_NAME", "cemention_stress")
+
+from database import client, db, products_collection  # noqa: E402
+from inventory import InsufficientStock, reserve_stock  # noqa: E402
+
+PRODUCT_A = "stress-prod-a"
+PRODUCT_B = "stress-prod-b"
+
+
+async def run(stock, orders, quantity, concurrency):
+    await client.drop_database(db.name)
+    await products_collection.create_index("id", unique=True)
+    # B has less stock, so later reservations fail on B after A succeeded and must roll A back
+    await products_collection.insert_many([
+        {"id": PRODUCT_A, "name": "Stress A", "stock_available": stock},
+        {"id": PRODUCT_B, "name": "Stress B", "stock_available": stock // 2},
+    ])
+
+    semaphore = asyncio.Semaphore(concurrency)
+    succeeded = 0
+    rejected = 0
+
+    async def checkout():
+        nonlocal succeeded, rejected
+        async with semaphore:
+            try:
+                await reserve_stock([(PRODUCT_A, quantity), (PRODUCT_B, quantity)])
+                succeeded += 1
+            except InsufficientStock:
+                rejected += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(checkout() for _ in range(orders)))
+    elapsed = time.perf_counter() - started
+
+    docs = {d["id"]: d["stock_available"] async for d in products_collection.find({}, {"_id": 0})}
+    expected_a = stock - succeeded * quantity
+    expected_b = stock // 2 - succeeded * quantity
+
+    print(f"{orders} checkouts at concurrency {concurrency} in {elapsed:.2f}s ({orders / elapsed:.0f}/s)")
+    print(f"  succeeded={succeeded} rejected={rejected}")
+    print(f"  stock A: {docs[PRODUCT_A]} (expected {expected_a})")
+    print(f"  stock B: {docs[PRODUCT_B]} (expected {expected_b})")
+
+    failures = []
+    if min(docs.values()) < 0:
+        failures.append("stock went negative")
+    if docs[PRODUCT_A] != expected_a or docs[PRODUCT_B] != expected_b:
+        failures.append("stock does not match successful reservations")
+    if succeeded > (stock // 2) // quantity:
+        failures.append("oversold")
+
+    await client.drop_database(db.name)
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stock", type=int, default=10000)
+    parser.add_argument("--orders", type=int, default=500)
+    parser.add_argument("--quantity", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=200)
+    args = parser.parse_args()
+
+    failures = asyncio.run(run(args.stock, args.orders, args.quantity, args.concurrency))
+    client.close()
+    if failures:
+        print("FAIL: " + "; ".join(failures))
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
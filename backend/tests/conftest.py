@@ -0,0 +1,14 @@
+import sys
+from pathlib import Path
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+# Backend modules import each other as top-level modules
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture
+def mongo():
+    """In-memory stand-in for the Motor database (no change streams, arrayFilters or explain)"""
+    return AsyncMongoMockClient(tz_aware=True).cemention
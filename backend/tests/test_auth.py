@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import auth
+import production_ready
+from auth import create_user_tokens, get_token_user, note_token_version, require_approved, verify_token
+from models import RefreshRequest, User, UserRole, UserStatus
+
+
+@pytest.fixture
+def users(monkeypatch, mongo):
+    monkeypatch.setattr(auth, "_token_versions", {})
+    monkeypatch.setattr(auth, "users_collection", mongo.users)
+    monkeypatch.setattr(production_ready, "users_collection", mongo.users)
+    return mongo.users
+
+
+def add_dealer(users, status=UserStatus.PENDING, token_version=0):
+    user = User(phone="+910000000001", role=UserRole.DEALER, status=status)
+    asyncio.run(users.insert_one({**user.model_dump(mode="json"), "token_version": token_version}))
+    return user
+
+
+def refresh(refresh_token):
+    return asyncio.run(production_ready.refresh_token(RefreshRequest(refresh_token=refresh_token)))
+
+
+def approved_user(access_token):
+    async def check():
+        return await require_approved(await get_token_user(f"Bearer {access_token}"))
+    return asyncio.run(check())
+
+
+def test_refresh_issues_tokens_with_current_claims(users):
+    user = add_dealer(users, status=UserStatus.APPROVED, token_version=2)
+    _, refresh_token = create_user_tokens(user)
+
+    response = refresh(refresh_token)
+
+    claims = verify_token(response.token)
+    assert (claims["user_id"], claims["status"], claims["ver"]) == (user.id, "APPROVED", 2)
+    assert verify_token(response.refresh_token, token_type="refresh")["user_id"] == user.id
+
+
+def test_refresh_rejects_access_tokens(users):
+    access_token, _ = create_user_tokens(add_dealer(users))
+    with pytest.raises(HTTPException) as error:
+        refresh(access_token)
+    assert error.value.status_code == 401
+
+
+def test_token_version_bump_revokes_older_access_tokens(users):
+    user = add_dealer(users)
+    old_token, _ = create_user_tokens(user, token_version=0)
+    new_token, _ = create_user_tokens(user, token_version=1)
+
+    note_token_version(user.id, 1)
+
+    with pytest.raises(HTTPException) as error:
+        verify_token(old_token)
+    assert error.value.detail == "Token has been revoked"
+    assert verify_token(new_token)["ver"] == 1
+
+
+def test_pending_dealer_is_forbidden(users):
+    access_token, _ = create_user_tokens(add_dealer(users))
+    with pytest.raises(HTTPException) as error:
+        approved_user(access_token)
+    assert error.value.status_code == 403
+
+
+def test_approval_on_another_worker_is_visible_after_refresh(users):
+    user = add_dealer(users)
+    access_token, refresh_token = create_user_tokens(user)
+    # Approved through another worker: the database changes, this worker's versions do not
+    asyncio.run(users.update_one({"id": user.id}, {"$set": {"status": "APPROVED"}, "$inc": {"token_version": 1}}))
+
+    with pytest.raises(HTTPException) as error:
+        approved_user(access_token)
+    assert error.value.status_code == 401  # the client's interceptor refreshes on this
+
+    assert approved_user(refresh(refresh_token).token).status == UserStatus.APPROVED
@@ -0,0 +1,91 @@
+import asyncio
+import json
+
+import pytest
+
+import routes_cart
+from database import INDEXES
+from models import CartItemAdd, Product, TokenUser, UserRole, UserStatus
+
+DEALER = TokenUser(id="u1", role=UserRole.DEALER, status=UserStatus.APPROVED)
+PRODUCT = Product(id="p1", name="OPC 53", brand="UltraTech")
+
+
+class FakeCatalog:
+    async def get(self, product_id):
+        await asyncio.sleep(0)
+        return PRODUCT if product_id == PRODUCT.id else None
+
+
+class InterleavingCollection:
+    """Yields to the event loop before every call, so concurrent requests interleave their steps"""
+
+    def __init__(self, collection):
+        self._collection = collection
+
+    def __getattr__(self, name):
+        method = getattr(self._collection, name)
+
+        async def call(*args, **kwargs):
+            await asyncio.sleep(0)
+            return await method(*args, **kwargs)
+        return call
+
+
+@pytest.fixture
+def carts(monkeypatch, mongo):
+    asyncio.run(mongo.carts.create_indexes(INDEXES["carts"]))
+    monkeypatch.setattr(routes_cart, "carts_collection", InterleavingCollection(mongo.carts))
+    monkeypatch.setattr(routes_cart, "catalog", FakeCatalog())
+    return mongo.carts
+
+
+def add(quantity, product_id=PRODUCT.id):
+    return routes_cart.add_to_cart(CartItemAdd(product_id=product_id, quantity=quantity), DEALER)
+
+
+def lines(response):
+    return [(item["product_id"], item["quantity"], item["price_per_bag"]) for item in json.loads(response.body)["items"]]
+
+
+def test_adding_a_product_twice_merges_the_quantity(carts):
+    async def scenario():
+        await add(100)
+        return await add(150)
+
+    assert lines(asyncio.run(scenario())) == [("p1", 250, PRODUCT.base_price_dealer)]
+
+
+def test_concurrent_first_adds_make_one_cart_with_one_line(carts):
+    async def scenario():
+        return await asyncio.gather(add(100), add(200))
+
+    first, second = asyncio.run(scenario())
+
+    docs = asyncio.run(carts.find({"user_id": DEALER.id}).to_list(None))
+    assert len(docs) == 1
+    assert [(item["product_id"], item["quantity"]) for item in docs[0]["items"]] == [("p1", 300)]
+    # One request pushed the line, the other hit the unique user_id index and merged into it
+    assert sorted(quantity for (_, quantity, _) in lines(first) + lines(second)) == [100, 300]
+
+
+def test_concurrent_adds_of_different_products_keep_both_lines(carts, monkeypatch):
+    other = PRODUCT.model_copy(update={"id": "p2"})
+
+    async def get(product_id):
+        await asyncio.sleep(0)
+        return {"p1": PRODUCT, "p2": other}.get(product_id)
+    monkeypatch.setattr(routes_cart.catalog, "get", get)
+
+    async def scenario():
+        await asyncio.gather(add(100, "p1"), add(200, "p2"))
+        return await carts.find_one({"user_id": DEALER.id})
+
+    cart = asyncio.run(scenario())
+    assert sorted((item["product_id"], item["quantity"]) for item in cart["items"]) == [("p1", 100), ("p2", 200)]
+
+
+def test_quantity_below_the_minimum_is_rejected(carts):
+    with pytest.raises(routes_cart.HTTPException) as error:
+        asyncio.run(add(routes_cart.MIN_ORDER_BAGS - 1))
+    assert error.value.status_code == 400
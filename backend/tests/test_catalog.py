@@ -0,0 +1,67 @@
+import asyncio
+
+import catalog as catalog_module
+from catalog import ProductCatalog
+from models import UserRole
+
+
+def product(product_id, name):
+    return {
+        "id": product_id, "name": name, "brand": "B",
+        "base_price_dealer": 300, "base_price_retailer": 310, "base_price_customer": 320,
+    }
+
+
+class FakeProducts:
+    """products_collection whose find() can be held open to interleave a write"""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.loads = 0
+        self.hold = None
+
+    def find(self, query, projection):
+        return self
+
+    async def to_list(self, n):
+        snapshot = [dict(doc) for doc in self.docs]
+        self.loads += 1
+        if self.hold is not None:
+            await self.hold.wait()
+        return snapshot
+
+
+def test_invalidate_during_load_is_not_lost(monkeypatch):
+    products = FakeProducts([product("p1", "Old name")])
+    monkeypatch.setattr(catalog_module, "products_collection", products)
+    catalog = ProductCatalog(ttl=3600)
+
+    async def scenario():
+        products.hold = asyncio.Event()
+        loading = asyncio.create_task(catalog.get("p1"))
+        await asyncio.sleep(0)  # the load has read the old snapshot and is waiting
+
+        products.docs = [product("p1", "New name")]  # admin write...
+        catalog.invalidate()  # ...and its invalidation, mid-load
+        products.hold.set()
+        await loading
+
+        products.hold = None
+        return await catalog.get("p1")
+
+    assert asyncio.run(scenario()).name == "New name"
+    assert products.loads == 2
+
+
+def test_fresh_catalog_is_served_without_reloading(monkeypatch):
+    products = FakeProducts([product("p1", "Cement")])
+    monkeypatch.setattr(catalog_module, "products_collection", products)
+    catalog = ProductCatalog(ttl=3600)
+
+    async def scenario():
+        await catalog.priced_payload(UserRole.DEALER)
+        return await catalog.priced_payload(UserRole.DEALER, "gzip")
+
+    body, etag = asyncio.run(scenario())
+    assert products.loads == 1
+    assert etag.startswith('"')
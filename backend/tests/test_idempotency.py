@@ -0,0 +1,145 @@
+import asyncio
+import copy
+
+import pytest
+from fastapi import HTTPException
+from fastapi.responses import Response
+from pymongo.errors import AutoReconnect, DuplicateKeyError
+
+import idempotency
+from idempotency import REPLAYED_HEADER, IdempotencyStore
+
+
+class FakeCollection:
+    """The few idempotency_collection calls the store makes, keyed by _id"""
+
+    def __init__(self, failing_updates=0):
+        self.docs = {}
+        self.failing_updates = failing_updates
+
+    async def insert_one(self, doc):
+        await asyncio.sleep(0)
+        if doc["_id"] in self.docs:
+            raise DuplicateKeyError("duplicate _id")
+        self.docs[doc["_id"]] = copy.deepcopy(doc)
+
+    async def find_one(self, query):
+        await asyncio.sleep(0)
+        return copy.deepcopy(self.docs.get(query["_id"]))
+
+    async def delete_one(self, query):
+        await asyncio.sleep(0)
+        doc = self.docs.get(query["_id"])
+        if doc is not None and all(doc.get(k) == v for k, v in query.items()):
+            del self.docs[query["_id"]]
+
+    async def update_one(self, query, update, upsert=False):
+        await asyncio.sleep(0)
+        if self.failing_updates:
+            self.failing_updates -= 1
+            raise AutoReconnect("primary stepped down")
+        doc = self.docs.setdefault(query["_id"], {"_id": query["_id"]})
+        doc.update(copy.deepcopy(update["$set"]))
+
+
+@pytest.fixture
+def collection(monkeypatch):
+    collection = FakeCollection()
+    monkeypatch.setattr(idempotency, "idempotency_collection", collection)
+    return collection
+
+
+def counting_execute(calls, delay=0.05):
+    async def execute():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        return Response(content=b'{"id": "o1"}', media_type="application/json")
+    return execute
+
+
+def test_concurrent_duplicates_execute_once(collection):
+    store = IdempotencyStore()
+    calls = []
+
+    async def scenario():
+        return await asyncio.gather(*(
+            store.run("k1", "u1", "orders.create", "{}", counting_execute(calls)) for _ in range(5)
+        ))
+
+    responses = asyncio.run(scenario())
+
+    assert len(calls) == 1
+    assert all(response.body == b'{"id": "o1"}' for response in responses)
+    assert sum(response.headers.get(REPLAYED_HEADER) == "true" for response in responses) == 4
+    assert collection.docs["u1:orders.create:k1"]["status"] == "done"
+
+
+def test_reused_key_with_different_payload_is_rejected(collection):
+    store = IdempotencyStore()
+
+    async def scenario():
+        await store.run("k1", "u1", "orders.create", "{}", counting_execute([]))
+        await store.run("k1", "u1", "orders.create", '{"other": 1}', counting_execute([]))
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(scenario())
+    assert error.value.status_code == 422
+
+
+def test_cancelled_first_request_releases_waiters_and_key(collection):
+    store = IdempotencyStore()
+    calls = []
+
+    async def scenario():
+        first = asyncio.create_task(store.run("k1", "u1", "orders.create", "{}", counting_execute(calls, delay=10)))
+        await asyncio.sleep(0.01)
+        duplicate = asyncio.create_task(store.run("k1", "u1", "orders.create", "{}", counting_execute(calls)))
+        await asyncio.sleep(0.01)
+        first.cancel()
+
+        with pytest.raises(HTTPException) as error:
+            await asyncio.wait_for(duplicate, 1)  # must not hang on the cancelled call
+        assert error.value.status_code == 409
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        assert "u1:orders.create:k1" not in collection.docs
+
+        # The key is free again: a retry runs the request
+        response = await store.run("k1", "u1", "orders.create", "{}", counting_execute(calls))
+        assert REPLAYED_HEADER not in response.headers
+
+    asyncio.run(scenario())
+    assert len(calls) == 2
+
+
+def test_failed_request_releases_key(collection):
+    store = IdempotencyStore()
+
+    async def failing():
+        raise HTTPException(status_code=400, detail="Cart is empty")
+
+    async def scenario():
+        with pytest.raises(HTTPException):
+            await store.run("k1", "u1", "orders.create", "{}", failing)
+        assert collection.docs == {}
+        return await store.run("k1", "u1", "orders.create", "{}", counting_execute([]))
+
+    assert REPLAYED_HEADER not in asyncio.run(scenario()).headers
+
+
+def test_completed_response_is_stored_despite_write_failures(collection):
+    collection.failing_updates = 2
+    store = IdempotencyStore()
+    calls = []
+
+    async def scenario():
+        await store.run("k1", "u1", "orders.create", "{}", counting_execute(calls))
+        # Another worker (empty front cache) must replay, not run the request again
+        other_worker = IdempotencyStore()
+        return await other_worker.run("k1", "u1", "orders.create", "{}", counting_execute(calls))
+
+    response = asyncio.run(scenario())
+
+    assert len(calls) == 1
+    assert response.headers[REPLAYED_HEADER] == "true"
+    assert collection.docs["u1:orders.create:k1"]["status"] == "done"
@@ -0,0 +1,37 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import mongomock
+
+from ids import id_range, id_timestamp, is_sortable_id, new_id, order_number
+
+
+def test_ids_are_unique_and_monotonic():
+    ids = [new_id() for _ in range(10000)]
+    assert ids == sorted(ids)
+    assert len(set(ids)) == len(ids)
+    assert all(is_sortable_id(value) for value in ids)
+
+
+def test_id_timestamp_round_trips_to_the_millisecond():
+    before = datetime.now(timezone.utc) - timedelta(milliseconds=1)
+    created = id_timestamp(new_id())
+    assert before <= created <= datetime.now(timezone.utc)
+    assert id_timestamp(str(uuid.uuid4())) is None
+
+
+def test_id_range_skips_legacy_uuid_ids():
+    collection = mongomock.MongoClient().db.orders
+    inside = new_id()
+    # Sorts between the bounds below, but is not a time-sortable id
+    legacy = "019ab3c4-5d6e-4f70-8a91-b2c3d4e5f607"
+    collection.insert_many([{"id": inside}, {"id": legacy}])
+
+    query = {"id": id_range(datetime(2015, 3, 1, tzinfo=timezone.utc), datetime.now(timezone.utc) + timedelta(days=1))}
+    assert query["id"]["$gte"] <= legacy < query["id"]["$lt"]
+    assert [doc["id"] for doc in collection.find(query)] == [inside]
+
+
+def test_order_number_carries_the_id_time():
+    order_id = new_id()
+    assert order_number(order_id) == f"ORD{id_timestamp(order_id):%Y%m%d%H%M%S}{order_id[-6:]}"
@@ -0,0 +1,136 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from pymongo.errors import AutoReconnect
+
+import inventory
+import routes_orders
+from inventory import InsufficientStock, release_stock, reserve_stock
+from models import OrderCreate, PaymentMethod, Product, TokenUser, UserRole, UserStatus
+
+DEALER = TokenUser(id="u1", role=UserRole.DEALER, status=UserStatus.APPROVED)
+
+
+@pytest.fixture
+def products(monkeypatch, mongo):
+    monkeypatch.setattr(inventory, "products_collection", mongo.products)
+    asyncio.run(mongo.products.insert_many([
+        {"id": "p1", "name": "OPC 53", "stock_available": 1000},
+        {"id": "p2", "name": "PPC", "stock_available": 120},
+    ]))
+    return mongo.products
+
+
+def stock(products):
+    async def read():
+        return {doc["id"]: doc["stock_available"] async for doc in products.find({}, {"_id": 0})}
+    return asyncio.run(read())
+
+
+def test_reserve_takes_merged_lines(products):
+    asyncio.run(reserve_stock([("p1", 100), ("p2", 20), ("p1", 50)]))
+    assert stock(products) == {"p1": 850, "p2": 100}
+
+    asyncio.run(release_stock([("p1", 100), ("p2", 20), ("p1", 50)]))
+    assert stock(products) == {"p1": 1000, "p2": 120}
+
+
+def test_partial_failure_puts_back_the_lines_already_taken(products):
+    with pytest.raises(InsufficientStock) as error:
+        asyncio.run(reserve_stock([("p1", 300), ("p2", 200), ("p1", 200)]))
+
+    assert error.value.product_ids == ["p2"]
+    assert stock(products) == {"p1": 1000, "p2": 120}
+
+
+def test_duplicate_lines_are_checked_against_their_total(products):
+    # 100 and 50 each fit into 120 bags, together they do not
+    with pytest.raises(InsufficientStock):
+        asyncio.run(reserve_stock([("p2", 100), ("p1", 100), ("p2", 50)]))
+
+    assert stock(products) == {"p1": 1000, "p2": 120}
+
+
+def test_concurrent_reservations_never_oversell(products):
+    async def scenario():
+        return await asyncio.gather(*(reserve_stock([("p2", 50)]) for _ in range(5)), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert sum(result is None for result in results) == 2
+    assert stock(products)["p2"] == 20
+
+
+class FakeCatalog:
+    async def get_many(self, product_ids):
+        return {pid: Product(id=pid, name=pid.upper(), brand="Test") for pid in product_ids}
+
+
+class FailingInserts:
+    def __init__(self, collection):
+        self._collection = collection
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+    async def insert_one(self, doc):
+        raise AutoReconnect("primary stepped down")
+
+
+@pytest.fixture
+def checkout(monkeypatch, mongo, products):
+    async def no_op(*args):
+        pass
+
+    monkeypatch.setattr(routes_orders, "carts_collection", mongo.carts)
+    monkeypatch.setattr(routes_orders, "addresses_collection", mongo.addresses)
+    monkeypatch.setattr(routes_orders, "orders_collection", mongo.orders)
+    monkeypatch.setattr(routes_orders, "catalog", FakeCatalog())
+    monkeypatch.setattr(routes_orders, "bump_versions", no_op)
+    monkeypatch.setattr(routes_orders, "increment_counters", no_op)
+    asyncio.run(mongo.addresses.insert_one({"id": "a1", "user_id": DEALER.id}))
+    return mongo
+
+
+def fill_cart(mongo, *lines):
+    items = [{"product_id": pid, "quantity": quantity, "price_per_bag": 300} for pid, quantity in lines]
+    asyncio.run(mongo.carts.insert_one({"user_id": DEALER.id, "items": items}))
+
+
+def create_order():
+    order_data = OrderCreate(delivery_address_id="a1", payment_method=PaymentMethod.BANK_TRANSFER)
+    return asyncio.run(routes_orders._create_order(order_data, DEALER))
+
+
+def test_create_order_with_insufficient_stock_is_a_409(checkout, products):
+    fill_cart(checkout, ("p1", 500), ("p2", 200))
+
+    with pytest.raises(HTTPException) as error:
+        create_order()
+
+    assert error.value.status_code == 409
+    assert "P2" in error.value.detail
+    assert stock(products) == {"p1": 1000, "p2": 120}
+    assert asyncio.run(checkout.orders.count_documents({})) == 0
+    assert len(asyncio.run(checkout.carts.find_one({"user_id": DEALER.id}))["items"]) == 2
+
+
+def test_create_order_releases_stock_when_the_insert_fails(checkout, products, monkeypatch):
+    fill_cart(checkout, ("p1", 500), ("p2", 100))
+    monkeypatch.setattr(routes_orders, "orders_collection", FailingInserts(checkout.orders))
+
+    with pytest.raises(AutoReconnect):
+        create_order()
+
+    assert stock(products) == {"p1": 1000, "p2": 120}
+    assert len(asyncio.run(checkout.carts.find_one({"user_id": DEALER.id}))["items"]) == 2
+
+
+def test_create_order_takes_stock_and_clears_the_cart(checkout, products):
+    fill_cart(checkout, ("p1", 500), ("p2", 100))
+
+    create_order()
+
+    assert stock(products) == {"p1": 500, "p2": 20}
+    assert asyncio.run(checkout.orders.find_one({"user_id": DEALER.id}))["stock_reserved"] is True
+    assert asyncio.run(checkout.carts.find_one({"user_id": DEALER.id}))["items"] == []
@@ -0,0 +1,79 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import otp_service
+from otp_service import OTP_MAX_ATTEMPTS, OTPService, hash_otp
+
+PHONE = "+910000000001"
+
+
+@pytest.fixture
+def otps(monkeypatch, mongo):
+    monkeypatch.setattr(otp_service, "DEMO_MODE", True)
+    monkeypatch.setattr(otp_service, "otp_collection", mongo.otps)
+    return mongo.otps
+
+
+def send(service):
+    # Demo mode returns the code instead of texting it
+    return asyncio.run(service.send_otp(PHONE))["otp"]
+
+
+def verify(service, otp):
+    return asyncio.run(service.verify_otp(PHONE, otp))["message"]
+
+
+def wrong_code(otp):
+    return f"{(int(otp) + 1) % 1000000:06d}"
+
+
+def test_code_is_stored_as_a_keyed_hash(otps):
+    otp = send(OTPService())
+    doc = asyncio.run(otps.find_one({"phone": PHONE}))
+    assert doc["otp_hash"] == hash_otp(PHONE, otp)
+    assert otp not in str(doc)
+
+
+def test_correct_code_verifies_exactly_once(otps):
+    service = OTPService()
+    otp = send(service)
+
+    assert verify(service, otp) == "OTP verified successfully"
+    assert verify(service, otp) == "OTP already used"
+
+
+def test_concurrent_verifications_succeed_once(otps):
+    service = OTPService()
+    otp = send(service)
+
+    async def scenario():
+        return await asyncio.gather(*(service.verify_otp(PHONE, otp) for _ in range(5)))
+
+    assert sum(result["success"] for result in asyncio.run(scenario())) == 1
+
+
+def test_wrong_codes_count_attempts_and_lock_out(otps):
+    service = OTPService()
+    otp = send(service)
+
+    for attempt in range(1, OTP_MAX_ATTEMPTS + 1):
+        assert verify(service, wrong_code(otp)) == "Invalid OTP"
+        assert asyncio.run(otps.find_one({"phone": PHONE}))["attempts"] == attempt
+
+    # Locked: even the right code is refused until a new one is sent
+    assert verify(service, otp) == "Too many attempts. Please request a new OTP"
+    assert verify(service, send(service)) == "OTP verified successfully"
+
+
+def test_expired_code_is_rejected(otps):
+    service = OTPService()
+    otp = send(service)
+    asyncio.run(otps.update_one({"phone": PHONE}, {"$set": {"expires_at": datetime.now(timezone.utc) - timedelta(seconds=1)}}))
+
+    assert verify(service, otp) == "OTP has expired"
+
+
+def test_unknown_phone(otps):
+    assert verify(OTPService(), "123456") == "No OTP found for this phone number"
@@ -0,0 +1,121 @@
+import asyncio
+import base64
+import json
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException, Response
+
+from pagination import NEXT_CURSOR_HEADER, PageParams, decode_cursor, encode_cursor, paginate
+
+CREATED = datetime(2026, 3, 1, 12, 30, tzinfo=timezone.utc)
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, keys):
+        self.sort_keys = keys
+        return self
+
+    def limit(self, n):
+        self.docs = self.docs[:n]
+        return self
+
+    async def to_list(self, n):
+        return self.docs[:n]
+
+
+class FakeCollection:
+    """Records the query paginate() builds and returns the given documents"""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.queries = []
+
+    def find(self, query, projection):
+        self.queries.append(query)
+        return FakeCursor(list(self.docs))
+
+
+def page(limit=2, cursor=None):
+    return PageParams(limit=limit, cursor=cursor)
+
+
+def test_cursor_round_trips_a_native_date():
+    created_at, doc_id = decode_cursor(encode_cursor({"created_at": CREATED, "id": "o1"}))
+    assert created_at == CREATED
+    assert doc_id == "o1"
+
+
+def test_cursor_keeps_a_legacy_iso_string_a_string():
+    created_at, doc_id = decode_cursor(encode_cursor({"created_at": CREATED.isoformat(), "id": "o1"}))
+    assert created_at == CREATED.isoformat()
+    assert doc_id == "o1"
+
+
+@pytest.mark.parametrize("cursor", ["not-base64!", "bm90IGpzb24=", "WzEsMl0="])
+def test_malformed_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+def raw_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+@pytest.mark.parametrize("values", [
+    ["2026-03-01T12:30:00", {"$ne": None}, False],
+    [{"$ne": None}, "o1", False],
+    [{"$gt": ""}, "o1", True],
+    ["2026-03-01T12:30:00", ["o1"], False],
+    ["2026-03-01T12:30:00", "o1", {"$ne": None}],
+])
+def test_cursor_with_non_string_values_is_a_400(values):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(raw_cursor(values))
+    assert error.value.status_code == 400
+
+
+def test_next_cursor_only_when_another_page_exists():
+    docs = [{"created_at": CREATED, "id": f"o{i}"} for i in range(3)]
+
+    response = Response()
+    result = asyncio.run(paginate(FakeCollection(docs), {}, page(limit=2), response))
+    assert [doc["id"] for doc in result] == ["o0", "o1"]
+    assert decode_cursor(response.headers[NEXT_CURSOR_HEADER]) == (CREATED, "o1")
+
+    response = Response()
+    asyncio.run(paginate(FakeCollection(docs), {}, page(limit=3), response))
+    assert NEXT_CURSOR_HEADER not in response.headers
+
+
+def boundary_clauses(cursor_created_at, ascending):
+    collection = FakeCollection([])
+    cursor = encode_cursor({"created_at": cursor_created_at, "id": "o1"})
+    asyncio.run(paginate(collection, {"user_id": "u1"}, page(cursor=cursor), Response(), ascending=ascending))
+    query = collection.queries[0]
+    assert query["$and"][0] == {"user_id": "u1"}
+    return query["$and"][1]["$or"]
+
+
+def test_newest_first_date_boundary_keeps_legacy_string_rows_reachable():
+    # Strings sort before dates: descending from a date must still reach the string rows
+    clauses = boundary_clauses(CREATED, ascending=False)
+    assert clauses[0] == {"created_at": {"$lt": CREATED}}
+    assert clauses[1] == {"created_at": CREATED, "id": {"$lt": "o1"}}
+    assert {"created_at": {"$type": "string"}} in clauses
+
+
+def test_oldest_first_string_boundary_keeps_date_rows_reachable():
+    clauses = boundary_clauses(CREATED.isoformat(), ascending=True)
+    assert clauses[0] == {"created_at": {"$gt": CREATED.isoformat()}}
+    assert {"created_at": {"$type": "date"}} in clauses
+
+
+@pytest.mark.parametrize("created_at, ascending", [(CREATED.isoformat(), False), (CREATED, True)])
+def test_boundaries_already_past_the_type_switch_add_no_extra_clause(created_at, ascending):
+    clauses = boundary_clauses(created_at, ascending)
+    assert len(clauses) == 2
@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+
+from sms import SMSDeliveryQueue, SMSProvider, StubSMSProvider
+
+
+class FlakyProvider(StubSMSProvider):
+    name = "flaky"
+
+    def __init__(self, failures: int):
+        super().__init__()
+        self.failures = failures
+
+    async def send(self, to: str, body: str) -> str:
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("gateway unavailable")
+        return await super().send(to, body)
+
+
+def test_provider_must_implement_send():
+    class Incomplete(SMSProvider):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_queue_retries_and_reports_stats():
+    async def scenario():
+        queue = SMSDeliveryQueue(FlakyProvider(failures=1), workers=1, max_attempts=2, backoff=0)
+        statuses = []
+
+        async def on_status(fields):
+            statuses.append(fields["delivery_status"])
+
+        queue.start()
+        assert queue.submit("+910000000000", "hello", on_status)
+        await queue.stop()
+        return queue.stats(), statuses
+
+    stats, statuses = asyncio.run(scenario())
+    assert statuses == ["RETRYING", "SENT"]
+    assert stats == {"provider": "flaky", "pending": 0, "sent": 1, "failed": 0, "retried": 1}
@@ -0,0 +1,28 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from auth import create_access_token, create_stream_token, get_stream_user
+from models import TokenUser, UserRole, UserStatus
+
+USER = TokenUser(id="user-1", role=UserRole.DEALER, status=UserStatus.APPROVED)
+
+
+def test_stream_token_opens_the_stream():
+    user = asyncio.run(get_stream_user(create_stream_token(USER)))
+    assert user == USER
+
+
+def test_access_token_is_not_accepted_in_the_query():
+    access_token = create_access_token({"user_id": USER.id, "role": USER.role.value, "status": USER.status.value})
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(get_stream_user(access_token))
+    assert error.value.status_code == 401
+
+
+def test_expired_stream_token_is_rejected():
+    token = create_access_token({"user_id": USER.id, "role": "DEALER", "status": "APPROVED"}, expires_minutes=-1, token_type="stream")
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(get_stream_user(token))
+    assert error.value.status_code == 401
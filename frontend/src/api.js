@@ -21,12 +21,58 @@ api.interceptors.request.use(
   (error) => Promise.reject(error)
 );
 
+// Access tokens are short-lived: on a 401, renew once with the refresh token and retry
+let refreshing = null;
+
+api.interceptors.response.use(
+  (response) => response,
+  async (error) => {
+    const original = error.config;
+    const refreshToken = localStorage.getItem('refreshToken');
+    if (error.response?.status !== 401 || !refreshToken || original._retried || original.url === '/auth/refresh') {
+      return Promise.reject(error);
+    }
+
+    original._retried = true;
+    try {
+      refreshing = refreshing || api.post('/auth/refresh', { refresh_token: refreshToken });
+      const { data } = await refreshing;
+      localStorage.setItem('token', data.token);
+      localStorage.setItem('refreshToken', data.refresh_token);
+    } catch (refreshError) {
+      localStorage.removeItem('token');
+      localStorage.removeItem('refreshToken');
+      return Promise.reject(error);
+    } finally {
+      refreshing = null;
+    }
+    return api(original);
+  }
+);
+
+// List endpoints are paginated: follow X-Next-Cursor until the last page and
+// resolve like a single response whose data holds every item
+const PAGE_SIZE = 1000;
+
+const getAllPages = async (url, params = {}) => {
+  const items = [];
+  let cursor;
+  let response;
+  do {
+    response = await api.get(url, { params: { ...params, limit: PAGE_SIZE, cursor } });
+    items.push(...response.data);
+    cursor = response.headers['x-next-cursor'];
+  } while (cursor);
+  return { ...response, data: items };
+};
+
 // Auth API
 export const authAPI = {
   sendOTP: (phone) => api.post('/auth/send-otp', { phone }),
   verifyOTP: (phone, otp) => api.post('/auth/verify-otp', { phone, otp }),
   register: (userData) => api.post('/auth/register', userData),
   login: (phone) => api.post('/auth/login', { phone }),
+  refresh: (refreshToken) => api.post('/auth/refresh', { refresh_token: refreshToken }),
   getMe: () => api.get('/auth/me'),
 };
 
@@ -40,6 +86,8 @@ export const productsAPI = {
 export const cartAPI = {
   get: () => api.get('/cart'),
   add: (productId, quantity) => api.post('/cart/add', { product_id: productId, quantity }),
+  update: (productId, quantity) => api.put(`/cart/items/${productId}`, { quantity }),
+  set: (items) => api.put('/cart', { items }),
   remove: (productId) => api.delete(`/cart/remove/${productId}`),
   clear: () => api.delete('/cart/clear'),
 };
@@ -51,36 +99,46 @@ export const addressAPI = {
   delete: (id) => api.delete(`/addresses/${id}`),
 };
 
+// Retries of a request sent with the same key are answered with the first response
+export const newIdempotencyKey = () => (
+  window.crypto?.randomUUID ? window.crypto.randomUUID() : `${Date.now()}-${Math.random().toString(36).slice(2)}`
+);
+
 // Orders API
 export const ordersAPI = {
-  create: (orderData) => api.post('/orders/create', orderData),
-  getMyOrders: () => api.get('/orders/my-orders'),
+  create: (orderData, idempotencyKey) => api.post('/orders/create', orderData, { headers: { 'Idempotency-Key': idempotencyKey } }),
+  getMyOrders: () => getAllPages('/orders/my-orders'),
   getById: (id) => api.get(`/orders/${id}`),
-  confirmPayment: (orderId, data) => api.post(`/orders/payment-confirmation/${orderId}`, data),
+  confirmPayment: (orderId, data, idempotencyKey) => api.post(`/orders/payment-confirmation/${orderId}`, data, { headers: { 'Idempotency-Key': idempotencyKey } }),
   createRequestOrder: (requestData) => api.post('/orders/request-order', requestData),
-  getMyRequestOrders: () => api.get('/orders/request-orders'),
+  getMyRequestOrders: () => getAllPages('/orders/request-orders'),
+  // Status push (SSE); EventSource cannot send headers, so it opens with a short-lived stream token
+  events: async () => {
+    const response = await api.post('/orders/events/token');
+    return new EventSource(`${API_BASE}/orders/events?token=${encodeURIComponent(response.data.token)}`);
+  },
 };
 
 // Admin API
 export const adminAPI = {
   // Users
-  getPendingUsers: () => api.get('/admin/users/pending'),
-  getAllUsers: (role) => api.get('/admin/users', { params: { role } }),
+  getPendingUsers: () => getAllPages('/admin/users/pending'),
+  getAllUsers: (role) => getAllPages('/admin/users', { role }),
   approveUser: (userId) => api.patch(`/admin/users/${userId}/approve`),
   rejectUser: (userId) => api.patch(`/admin/users/${userId}/reject`),
   
   // Products
   createProduct: (productData) => api.post('/admin/products', productData),
-  getAllProducts: () => api.get('/admin/products'),
+  getAllProducts: () => getAllPages('/admin/products'),
   updateProduct: (productId, productData) => api.patch(`/admin/products/${productId}`, productData),
   deleteProduct: (productId) => api.delete(`/admin/products/${productId}`),
   
   // Orders
-  getAllOrders: () => api.get('/admin/orders'),
+  getAllOrders: () => getAllPages('/admin/orders'),
   updateOrder: (orderId, orderData) => api.patch(`/admin/orders/${orderId}`, orderData),
   
   // Request Orders
-  getAllRequestOrders: () => api.get('/admin/request-orders'),
+  getAllRequestOrders: () => getAllPages('/admin/request-orders'),
   updateRequestOrder: (requestId, requestData) => api.patch(`/admin/request-orders/${requestId}`, requestData),
   
   // Reports
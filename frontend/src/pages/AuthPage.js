@@ -73,7 +73,7 @@ const AuthPage = () => {
         const loginResponse = await authAPI.login(formattedPhone);
         
         if (loginResponse.data.success) {
-          login(loginResponse.data.user, loginResponse.data.token);
+          login(loginResponse.data.user, loginResponse.data.token, loginResponse.data.refresh_token);
           toast.success('Login successful');
           
           if (loginResponse.data.user.role === 'ADMIN') {
@@ -124,7 +124,7 @@ const AuthPage = () => {
       const response = await authAPI.register(registerData);
       
       if (response.data.success) {
-        login(response.data.user, response.data.token);
+        login(response.data.user, response.data.token, response.data.refresh_token);
         toast.success('Registration successful');
         
         if (response.data.user.status === 'PENDING') {
@@ -1,10 +1,10 @@
-import React, { useEffect, useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { Button } from '../components/ui/button';
 import { Input } from '../components/ui/input';
 import { Label } from '../components/ui/label';
 import { RadioGroup, RadioGroupItem } from '../components/ui/radio-group';
-import { addressAPI, ordersAPI, cartAPI } from '../api';
+import { addressAPI, ordersAPI, cartAPI, newIdempotencyKey } from '../api';
 import { formatCurrency } from '../utils';
 import { ArrowLeft } from 'lucide-react';
 import { toast } from 'sonner';
@@ -16,6 +16,8 @@ const CheckoutPage = () => {
   const [paymentMethod, setPaymentMethod] = useState('UPI');
   const [cart, setCart] = useState({ items: [], total: 0 });
   const [loading, setLoading] = useState(false);
+  // One key per distinct order attempt, so retrying after a network error cannot place it twice
+  const orderKeys = useRef({});
   const navigate = useNavigate();
 
   const [addressForm, setAddressForm] = useState({
@@ -78,7 +80,9 @@ const CheckoutPage = () => {
         payment_method: paymentMethod
       };
       
-      const response = await ordersAPI.create(orderData);
+      const attempt = `${selectedAddress}:${paymentMethod}`;
+      orderKeys.current[attempt] = orderKeys.current[attempt] || newIdempotencyKey();
+      const response = await ordersAPI.create(orderData, orderKeys.current[attempt]);
       toast.success('Order placed successfully!');
       navigate(`/orders`);
     } catch (error) {
@@ -12,7 +12,46 @@ const OrdersPage = () => {
   const navigate = useNavigate();
 
   useEffect(() => {
-    loadOrders();
+    let source = null;
+    let retry = null;
+    let closed = false;
+
+    // Status changes are pushed by the server instead of polling my-orders
+    const connect = async () => {
+      let stream;
+      try {
+        stream = await ordersAPI.events();
+      } catch (error) {
+        if (!closed) retry = setTimeout(reconnect, 5000);
+        return;
+      }
+      if (closed) {
+        stream.close();
+        return;
+      }
+      source = stream;
+      stream.addEventListener('order', (event) => {
+        const update = JSON.parse(event.data);
+        setOrders((current) => current.map((order) => (order.id === update.id ? { ...order, ...update } : order)));
+      });
+      stream.onerror = () => {
+        // The stream token is only valid for opening the stream: reconnect with a fresh one
+        // rather than letting EventSource retry the same URL, and refetch what was missed
+        stream.close();
+        retry = setTimeout(reconnect, 3000);
+      };
+    };
+    const reconnect = () => {
+      connect();
+      loadOrders();
+    };
+
+    reconnect();
+    return () => {
+      closed = true;
+      clearTimeout(retry);
+      if (source) source.close();
+    };
   }, []);
 
   const loadOrders = async () => {